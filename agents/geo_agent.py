@@ -1,16 +1,13 @@
 """
 Geo and Route Agents with Bhopal/Sehore regional validation
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from utils.geohash_utils import encode_location, get_neighbors
 from utils.route_utils import generate_route_prediction, get_cctv_videos_for_route
 from config.bhopal_sehore_locations import (
     is_location_in_region, 
     get_location_by_name,
-    get_nearest_cctv_location
+    get_nearest_cctv_location,
+    CCTV_BY_ID
 )
 
 def process_location(lat, lon):
@@ -32,10 +29,13 @@ def process_location(lat, lon):
     nearest_cctv, distance = get_nearest_cctv_location(lat, lon)
     
     return {
+        "lat": lat,
+        "lon": lon,
         "geohash": gh,
         "neighbors": neighbors,
         "valid": True,
         "nearest_cctv": nearest_cctv["name"],
+        "nearest_cctv_id": nearest_cctv["id"],
         "cctv_distance": round(distance, 2)
     }
 
@@ -51,15 +51,24 @@ def process_location_by_name(location_name):
             "valid": False
         }
     
-    return process_location(coords["lat"], coords["lon"])
+    return process_location(coords.lat, coords.lon)
 
-def predict_route(start_lat, start_lon, time_lost=None):
+def predict_route(start_lat, start_lon, time_lost=None, geohash=None,
+                  nearest_cctv_id=None, cctv_distance=None):
     """
     Predict route with CCTV locations.
     If time_lost is provided, uses time-based analysis.
+    geohash / nearest_cctv_id / cctv_distance can be passed from process_location
+    results so the start point isn't re-encoded or re-matched to a CCTV.
     """
-    result = generate_route_prediction(start_lat, start_lon, steps=5, time_lost=time_lost)
+    start_cctv = None
+    if nearest_cctv_id in CCTV_BY_ID and cctv_distance is not None:
+        start_cctv = (CCTV_BY_ID[nearest_cctv_id], cctv_distance)
+    
+    result = generate_route_prediction(
+        start_lat, start_lon, steps=5, time_lost=time_lost,
+        start_geohash=geohash, start_cctv=start_cctv
+    )
     
     # Result already contains route, cctv_videos, and num_cctv_locations
     return result
-
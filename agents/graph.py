@@ -1,12 +1,16 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Any, Optional
+import asyncio
+import operator
+from langgraph.graph import StateGraph, START, END
+from typing import TypedDict, List, Any, Optional, Annotated
 
 # Define State
+# nlp_results / geo_results are merged (dict union) so branches running in
+# parallel can each write their part without clobbering the other
 class AgentState(TypedDict):
     case_id: int
     input_data: dict
-    nlp_results: dict
-    geo_results: dict
+    nlp_results: Annotated[dict, operator.or_]
+    geo_results: Annotated[dict, operator.or_]
     route_results: dict
     scan_results: bool
     status: str
@@ -15,12 +19,17 @@ class AgentState(TypedDict):
     cancellation_reason: Optional[str]
 
 # Import Agents
-from .nlp_agent import extract_metadata, transcribe_audio, analyze_emotion, extract_location_from_text
+from .nlp_agent import (
+    transcribe_audio,
+    extract_metadata_async,
+    analyze_emotion_async,
+    extract_location_from_text_async,
+)
 from .geo_agent import process_location, predict_route
 from .video_agent import scan_video
 
 # Node Functions
-def nlp_node(state: AgentState):
+async def nlp_node(state: AgentState):
     print("--- NLP Agent ---")
     text = state['input_data'].get('description', '')
     voice_path = state['input_data'].get('voice_path')
@@ -30,11 +39,12 @@ def nlp_node(state: AgentState):
         transcription = transcribe_audio(voice_path)
         text += " " + transcription
         
-    metadata = extract_metadata(text)
-    emotion = analyze_emotion(text)
-    
-    # Try to extract location from text
-    location_from_text = extract_location_from_text(text)
+    # Metadata, emotion and location are independent Gemini calls - run them concurrently
+    metadata, emotion, location_from_text = await asyncio.gather(
+        extract_metadata_async(text),
+        analyze_emotion_async(text),
+        extract_location_from_text_async(text),
+    )
     
     return {
         "nlp_results": {
@@ -82,17 +92,29 @@ def should_cancel_complaint(state: AgentState) -> str:
         return 'cancel'
     return 'continue'
 
-def geo_node(state: AgentState):
-    print("--- Geo Agent ---")
+def geo_coords_node(state: AgentState):
+    """
+    Resolve the location from coordinates given directly in the complaint.
+    Runs in parallel with the NLP branch since it doesn't need its results.
+    """
     lat = state['input_data'].get('last_seen_lat')
     lon = state['input_data'].get('last_seen_lon')
     
     if lat and lon:
+        print("--- Geo Agent (coordinates) ---")
         res = process_location(lat, lon)
         if not res.get('valid', False):
             return {"geo_results": res, "error": res.get('error')}
         return {"geo_results": res}
     
+    return {}
+
+def geo_node(state: AgentState):
+    # Coordinates were already resolved by geo_coords_node
+    if state.get('geo_results') or state.get('error'):
+        return {}
+    
+    print("--- Geo Agent ---")
     # Try to use location from NLP
     location_from_text = state['nlp_results'].get('location_from_text')
     if location_from_text:
@@ -114,23 +136,17 @@ def route_node(state: AgentState):
     if not geo_results or not geo_results.get('valid', False):
         return {"route_results": {}}
     
-    # Get coordinates from input or geo results
-    lat = state['input_data'].get('last_seen_lat')
-    lon = state['input_data'].get('last_seen_lon')
-    time_lost = state['input_data'].get('time_lost')
-    
-    if not lat or not lon:
-        # Try from NLP location
-        location_from_text = state['nlp_results'].get('location_from_text')
-        if location_from_text:
-            lat = location_from_text['lat']
-            lon = location_from_text['lon']
-    
-    if lat and lon:
-        route = predict_route(lat, lon, time_lost=time_lost)
-        return {"route_results": route}
-    
-    return {"route_results": {}}
+    # geo_node already resolved coordinates (from input or NLP), the start
+    # geohash and the nearest CCTV - reuse them instead of recomputing
+    route = predict_route(
+        geo_results['lat'],
+        geo_results['lon'],
+        time_lost=state['input_data'].get('time_lost'),
+        geohash=geo_results.get('geohash'),
+        nearest_cctv_id=geo_results.get('nearest_cctv_id'),
+        cctv_distance=geo_results.get('cctv_distance'),
+    )
+    return {"route_results": route}
 
 def video_node(state: AgentState):
     print("--- Video Agent ---")
@@ -143,10 +159,13 @@ workflow = StateGraph(AgentState)
 
 workflow.add_node("nlp", nlp_node)
 workflow.add_node("emotion_validation", emotion_validation_node)
+workflow.add_node("geo_if_coords", geo_coords_node)
 workflow.add_node("geo", geo_node)
 workflow.add_node("route", route_node)
 
-workflow.set_entry_point("nlp")
+# Fan out: NLP and coordinate-based geo processing are independent
+workflow.add_edge(START, "nlp")
+workflow.add_edge(START, "geo_if_coords")
 
 workflow.add_edge("nlp", "emotion_validation")
 
@@ -160,14 +179,15 @@ workflow.add_conditional_edges(
     }
 )
 
-workflow.add_edge("geo", "route")
+# Fan in: route waits for both the coordinate branch and the NLP/geo branch
+workflow.add_edge(["geo_if_coords", "geo"], "route")
 workflow.add_edge("route", END)
 
 app = workflow.compile()
 
-def run_complaint_process(input_data):
+async def arun_complaint_process(input_data):
     """
-    Run the agent workflow for a new complaint.
+    Run the agent workflow for a new complaint (async).
     """
     initial_state = {
         "case_id": 0,  # Placeholder
@@ -182,6 +202,12 @@ def run_complaint_process(input_data):
         "cancellation_reason": None
     }
     
-    result = app.invoke(initial_state)
+    result = await app.ainvoke(initial_state)
     return result
 
+def run_complaint_process(input_data):
+    """
+    Run the agent workflow for a new complaint.
+    """
+    return asyncio.run(arun_complaint_process(input_data))
+
@@ -2,10 +2,15 @@
 NLP and Voice Agents using Google Gemini API with fallback mechanisms
 """
 
-import sys
 import os
 import json
+import re
+import copy
 import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -17,8 +22,9 @@ os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 os.environ["GOOGLE_API_USE_GEMINI_V1"] = "true"
 
 
+from config.bhopal_sehore_locations import get_location_by_name
+
 # Import Gemini configuration
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.gemini_config import (
     get_gemini_api_key,
     is_gemini_configured,
@@ -28,44 +34,187 @@ from config.gemini_config import (
     LOCATION_EXTRACTION_PROMPT,
     MAX_RETRIES,
     RETRY_DELAY_SECONDS,
+    MAX_CONCURRENT_REQUESTS,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCH_PROMPT_HEADER,
+    BATCH_TASK_MARKER,
+    BATCH_RESPONSE_MARKER,
+    NLP_CACHE_MAXSIZE,
+    NLP_CACHE_DIR,
 )
 
-# Try to import Gemini API
+# Faster JSON parsing for Gemini responses when orjson is installed
 try:
-    import google.generativeai as genai
+    import orjson
 
-    GEMINI_AVAILABLE = True
+    _json_loads = orjson.loads
 except ImportError:
-    GEMINI_AVAILABLE = False
-    print("[WARNING] google-generativeai not installed. Using fallback methods.")
+    _json_loads = json.loads
 
-# Initialize Gemini if available
-if GEMINI_AVAILABLE and is_gemini_configured():
-    try:
-        genai.configure(api_key=get_gemini_api_key())
-        gemini_model = genai.GenerativeModel(model_name=GEMINI_TEXT_MODEL, generation_config={
-            "temperature": 0.35,
-        })
-        print("[INFO] Gemini API initialized successfully.")
-    except Exception as e:
-        print(f"[WARNING] Failed to initialize Gemini API: {e}")
-        GEMINI_AVAILABLE = False
-else:
-    GEMINI_AVAILABLE = False
+GENERATION_CONFIG = {"temperature": 0.35}
+
+# The google-genai client is imported and created on first use, so processes
+# that never call Gemini (geo / notification workers) skip the SDK import and
+# HTTP client setup. Once created, the single client keeps its connection
+# pools (sync and async) alive and every call reuses them.
+GEMINI_AVAILABLE = is_gemini_configured()
+if not GEMINI_AVAILABLE:
     print("[INFO] Using fallback NLP methods (Gemini not configured).")
 
+_gemini_client = None
+_gemini_client_lock = threading.Lock()
+
+
+def _get_client():
+    """
+    Get the shared Gemini client, initializing it on first call.
+    Returns None if google-genai is unavailable or fails to initialize.
+    """
+    global _gemini_client, GEMINI_AVAILABLE
+    if _gemini_client is not None or not GEMINI_AVAILABLE:
+        return _gemini_client
+
+    with _gemini_client_lock:
+        if _gemini_client is None and GEMINI_AVAILABLE:
+            try:
+                from google import genai
+
+                _gemini_client = genai.Client(
+                    api_key=get_gemini_api_key(),
+                    http_options={"api_version": "v1"},
+                )
+                print("[INFO] Gemini API initialized successfully.")
+            except ImportError:
+                GEMINI_AVAILABLE = False
+                print("[WARNING] google-genai not installed. Using fallback methods.")
+            except Exception as e:
+                GEMINI_AVAILABLE = False
+                print(f"[WARNING] Failed to initialize Gemini API: {e}")
+
+    return _gemini_client
+
+def _split_prompt(template):
+    """
+    Split a prompt template with a single {text} placeholder into its literal
+    prefix and suffix once, so building a prompt is a plain concatenation.
+    """
+    return tuple(
+        part.replace("{{", "{").replace("}}", "}")
+        for part in template.split("{text}", 1)
+    )
+
+
+_METADATA_PROMPT = _split_prompt(METADATA_EXTRACTION_PROMPT)
+_EMOTION_PROMPT = _split_prompt(EMOTION_ANALYSIS_PROMPT)
+_LOCATION_PROMPT = _split_prompt(LOCATION_EXTRACTION_PROMPT)
+
+
+def _build_prompt(parts, text):
+    prefix, suffix = parts
+    return f"{prefix}{text}{suffix}"
+
+
+# Optional persistent cache so restarts keep Gemini results warm
+try:
+    import diskcache
+
+    _nlp_disk_cache = diskcache.Cache(NLP_CACHE_DIR)
+except Exception:
+    _nlp_disk_cache = None
+
+_nlp_cache = OrderedDict()
+_nlp_cache_lock = threading.Lock()
+
+
+def _nlp_cache_key(task, text):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{task}:{digest}"
+
+
+def _get_cached_result(task, text):
+    """
+    Look up a cached Gemini result for this task and text.
+    Returns a copy of the cached value, or None on a miss.
+    """
+    key = _nlp_cache_key(task, text)
+    with _nlp_cache_lock:
+        if key in _nlp_cache:
+            _nlp_cache.move_to_end(key)
+            return copy.deepcopy(_nlp_cache[key])
+
+    if _nlp_disk_cache is not None:
+        try:
+            value = _nlp_disk_cache.get(key)
+        except Exception as e:
+            print(f"[WARNING] NLP disk cache read failed: {e}")
+            value = None
+        if value is not None:
+            _cache_result(task, text, value, persist=False)
+            return copy.deepcopy(value)
+
+    return None
+
+
+def _cache_result(task, text, value, persist=True):
+    """Store a Gemini result in the LRU cache (and on disk if available)."""
+    key = _nlp_cache_key(task, text)
+    with _nlp_cache_lock:
+        _nlp_cache[key] = copy.deepcopy(value)
+        _nlp_cache.move_to_end(key)
+        while len(_nlp_cache) > NLP_CACHE_MAXSIZE:
+            _nlp_cache.popitem(last=False)
+
+    if persist and _nlp_disk_cache is not None:
+        try:
+            _nlp_disk_cache.set(key, value)
+        except Exception as e:
+            print(f"[WARNING] NLP disk cache write failed: {e}")
+
+
+# Async Gemini calls from every complaint (each under its own asyncio.run, on
+# Streamlit session threads) run on one event loop in a daemon thread, so a
+# single semaphore caps concurrent requests for the whole process
+_gemini_loop = None
+_gemini_loop_lock = threading.Lock()
+_gemini_semaphore = None
+
+
+def _get_gemini_loop():
+    """Get the shared Gemini event loop, starting its thread on first use."""
+    global _gemini_loop
+    with _gemini_loop_lock:
+        if _gemini_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="gemini-loop", daemon=True
+            ).start()
+            _gemini_loop = loop
+    return _gemini_loop
+
+
+async def _run_on_gemini_loop(coro):
+    """Run a coroutine on the shared Gemini loop and await its result."""
+    loop = _get_gemini_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
 
 def call_gemini_with_retry(prompt, max_retries=MAX_RETRIES):
     """
     Call Gemini API with retry logic.
     Returns response text or None on failure.
     """
-    if not GEMINI_AVAILABLE:
+    client = _get_client()
+    if client is None:
         return None
 
     for attempt in range(max_retries):
         try:
-            response = gemini_model.generate_content(prompt)
+            response = client.models.generate_content(
+                model=GEMINI_TEXT_MODEL, contents=prompt, config=GENERATION_CONFIG
+            )
             return response.text
         except Exception as e:
             print(
@@ -77,34 +226,296 @@ def call_gemini_with_retry(prompt, max_retries=MAX_RETRIES):
     return None
 
 
-def extract_metadata(text):
+async def call_gemini_with_retry_async(prompt, max_retries=MAX_RETRIES):
     """
-    Extract metadata from text using Gemini API with fallback.
+    Async variant of call_gemini_with_retry.
+    Concurrent calls across the process are capped by MAX_CONCURRENT_REQUESTS
+    to respect rate limits.
+    Returns response text or None on failure.
     """
-    # Try Gemini API first
-    if GEMINI_AVAILABLE:
-        try:
-            prompt = METADATA_EXTRACTION_PROMPT.format(text=text)
-            response = call_gemini_with_retry(prompt)
+    return await _run_on_gemini_loop(_call_gemini_limited(prompt, max_retries))
 
-            if response:
-                # Parse JSON response
-                # Clean response (remove markdown code blocks if present)
-                response = response.strip()
-                if response.startswith("```json"):
-                    response = response[7:]
-                if response.startswith("```"):
-                    response = response[3:]
-                if response.endswith("```"):
-                    response = response[:-3]
-                response = response.strip()
-
-                data = json.loads(response)
-                return data
+
+async def _call_gemini_limited(prompt, max_retries):
+    # Runs on the shared Gemini loop, which owns the semaphore
+    global _gemini_semaphore
+    client = _get_client()
+    if client is None:
+        return None
+
+    if _gemini_semaphore is None:
+        _gemini_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+    async with _gemini_semaphore:
+        for attempt in range(max_retries):
+            try:
+                response = await client.aio.models.generate_content(
+                    model=GEMINI_TEXT_MODEL, contents=prompt, config=GENERATION_CONFIG
+                )
+                return response.text
+            except Exception as e:
+                print(
+                    f"[WARNING] Gemini API call failed (attempt {attempt + 1}/{max_retries}): {e}"
+                )
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(RETRY_DELAY_SECONDS)
+
+    return None
+
+
+_BATCH_RESPONSE_RE = re.compile(
+    re.escape(BATCH_RESPONSE_MARKER).replace(re.escape("{index}"), r"(\d+)")
+)
+
+
+def _build_batch_prompt(prompts):
+    """Combine several prompts into one request with numbered task markers."""
+    parts = [BATCH_PROMPT_HEADER.format(count=len(prompts))]
+    for index, prompt in enumerate(prompts, start=1):
+        parts.append(BATCH_TASK_MARKER.format(index=index))
+        parts.append(prompt)
+    return "\n".join(parts)
+
+
+def _split_batch_response(response, count):
+    """
+    Split a batched response back into per-prompt answers.
+    Returns None if any answer is missing so callers can fall back.
+    """
+    if not response:
+        return None
+
+    answers = {}
+    matches = list(_BATCH_RESPONSE_RE.finditer(response))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        answers[int(match.group(1))] = response[match.end():end].strip()
+
+    if any(index not in answers for index in range(1, count + 1)):
+        return None
+    return [answers[index] for index in range(1, count + 1)]
+
+
+class GeminiBatcher:
+    """
+    Coalesces concurrently pending Gemini prompts into a single API request.
+
+    A worker task drains up to max_batch prompts (waiting at most max_wait_ms
+    for more to arrive), sends them as one prompt and resolves each caller's
+    future with its own slice of the answer.
+    """
+
+    def __init__(self, max_batch=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue = None
+        self._worker = None
+        self._loop = None
+        self._inflight = set()
+
+    def is_running(self):
+        """Check if the worker is running on the current event loop."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self._worker is not None and not self._worker.done() and self._loop is loop
+
+    def start(self):
+        """Start the batching worker on the running event loop."""
+        if self.is_running():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._worker = self._loop.create_task(self._run())
+
+    async def stop(self):
+        """Flush in-flight batches and stop the worker."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+        # Anything still queued is sent individually
+        while self._queue is not None and not self._queue.empty():
+            prompt, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result(await call_gemini_with_retry_async(prompt))
+
+        self._worker = None
+        self._queue = None
+        self._loop = None
+
+    async def submit(self, prompt):
+        """
+        Queue a prompt for the next batch and wait for its response text.
+        Falls back to a direct call when the worker is not running.
+        """
+        if not self.is_running():
+            return await call_gemini_with_retry_async(prompt)
+
+        future = self._loop.create_future()
+        await self._queue.put((prompt, future))
+        return await future
+
+    async def _run(self):
+        batch = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                deadline = self._loop.time() + self.max_wait_ms / 1000
+
+                while len(batch) < self.max_batch:
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                self._schedule_dispatch(batch)
+                batch = []
+        except asyncio.CancelledError:
+            # Don't strand prompts already taken off the queue
+            if batch:
+                self._schedule_dispatch(batch)
+            raise
+
+    def _schedule_dispatch(self, batch):
+        # Dispatch without blocking so the next batch can start filling
+        task = self._loop.create_task(self._dispatch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            if len(prompts) == 1:
+                results = [await call_gemini_with_retry_async(prompts[0])]
+            else:
+                response = await call_gemini_with_retry_async(_build_batch_prompt(prompts))
+                results = _split_batch_response(response, len(prompts))
+                if results is None:
+                    print(
+                        f"[WARNING] Could not split batched Gemini response for {len(prompts)} prompts. Retrying individually."
+                    )
+                    results = await asyncio.gather(
+                        *(call_gemini_with_retry_async(prompt) for prompt in prompts)
+                    )
         except Exception as e:
-            print(f"[WARNING] Gemini metadata extraction failed: {e}. Using fallback.")
+            print(f"[WARNING] Gemini batch request failed: {e}")
+            results = [None] * len(prompts)
 
-    # Fallback: Simple keyword extraction
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# One batcher for the whole process, living on the shared Gemini loop, so
+# prompts from concurrent complaints are coalesced into the same requests
+_gemini_batcher = GeminiBatcher()
+
+
+async def _submit_batched(prompt):
+    # Runs on the shared Gemini loop; the worker starts with the first prompt
+    _gemini_batcher.start()
+    return await _gemini_batcher.submit(prompt)
+
+
+async def submit_gemini_prompt(prompt):
+    """Queue a prompt on the shared Gemini batcher and wait for its response text."""
+    return await _run_on_gemini_loop(_submit_batched(prompt))
+
+
+def _make_keyword_finder(keywords):
+    """
+    Compile keywords into a single regex that reports every (overlapping)
+    occurrence in one pass over the text.
+    Returns a function mapping lowercase text to the set of keywords found,
+    with the same results as checking `keyword in text` for each keyword.
+    """
+    pattern = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    scanner = re.compile(f"(?=({pattern}))")
+    # A match on a longer keyword also covers keywords that are its prefix
+    covered = {k: [p for p in keywords if k.startswith(p)] for k in keywords}
+
+    def find(text_lower):
+        found = set()
+        for match in scanner.finditer(text_lower):
+            found.update(covered[match.group(1)])
+        return found
+
+    return find
+
+
+# Bhopal/Sehore location references picked up by the metadata fallback
+_METADATA_LOCATION_KEYWORDS = [
+    "bhopal",
+    "sehore",
+    "junction",
+    "station",
+    "bus stand",
+    "market",
+    "mp nagar",
+    "habibganj",
+    "isbt",
+    "brts",
+    "ashoka garden",
+    "db mall",
+]
+_find_metadata_locations = _make_keyword_finder(_METADATA_LOCATION_KEYWORDS)
+
+# Fallback emotion keywords in priority order (first matching category wins)
+_EMOTION_KEYWORDS = [
+    ("Joking", ["haha", "lol", "joke", "joking", "kidding", "funny", "laugh"]),
+    ("Happy/Relieved", ["happy", "relieved", "glad", "joy", "found"]),
+    ("Anxious/Worried", ["worried", "anxious", "scared", "afraid", "panic", "fear"]),
+    ("Sad", ["sad", "crying", "depressed", "upset", "heartbroken"]),
+    ("Angry", ["angry", "furious", "mad", "rage"]),
+]
+_EMOTION_BY_KEYWORD = {
+    word: emotion for emotion, words in _EMOTION_KEYWORDS for word in words
+}
+_find_emotion_keywords = _make_keyword_finder(list(_EMOTION_BY_KEYWORD))
+
+# Known locations checked by the fallback location extractor, in priority order
+_FALLBACK_LOCATION_NAMES = [
+    "bhopal junction",
+    "sehore bus stand",
+    "mp nagar",
+    "habibganj",
+    "new market",
+    "brts",
+    "roshanpura",
+    "sehore station",
+    "db mall",
+    "isbt",
+    "ashoka garden",
+]
+_find_location_names = _make_keyword_finder(_FALLBACK_LOCATION_NAMES)
+
+
+_FENCE_RE = re.compile(r"\A\s*```(?:json)?|```\s*\Z")
+
+
+def _strip_code_fence(response):
+    """Remove markdown code blocks from a Gemini response."""
+    return _FENCE_RE.sub("", response).strip()
+
+
+def _parse_metadata_response(response):
+    """Parse Gemini's metadata JSON response."""
+    return _json_loads(_strip_code_fence(response))
+
+
+def _fallback_metadata(text):
+    """Simple keyword extraction used when Gemini is unavailable."""
     try:
         data = {"names": [], "locations": [], "dates": [], "keywords": []}
 
@@ -115,25 +526,8 @@ def extract_metadata(text):
                 data["keywords"].append(word)
 
         # Extract location references for Bhopal/Sehore
-        location_keywords = [
-            "bhopal",
-            "sehore",
-            "junction",
-            "station",
-            "bus stand",
-            "market",
-            "mp nagar",
-            "habibganj",
-            "isbt",
-            "brts",
-            "ashoka garden",
-            "db mall",
-        ]
-
-        text_lower = text.lower()
-        for keyword in location_keywords:
-            if keyword in text_lower:
-                data["locations"].append(keyword)
+        found = _find_metadata_locations(text.lower())
+        data["locations"] = [k for k in _METADATA_LOCATION_KEYWORDS if k in found]
 
         return data
     except Exception as e:
@@ -141,6 +535,53 @@ def extract_metadata(text):
         return {"names": [], "locations": [], "dates": [], "keywords": []}
 
 
+def extract_metadata(text):
+    """
+    Extract metadata from text using Gemini API with fallback.
+    """
+    # Try Gemini API first
+    if GEMINI_AVAILABLE:
+        cached = _get_cached_result("metadata", text)
+        if cached is not None:
+            return cached
+
+        try:
+            prompt = _build_prompt(_METADATA_PROMPT, text)
+            response = call_gemini_with_retry(prompt)
+
+            if response:
+                data = _parse_metadata_response(response)
+                _cache_result("metadata", text, data)
+                return data
+        except Exception as e:
+            print(f"[WARNING] Gemini metadata extraction failed: {e}. Using fallback.")
+
+    return _fallback_metadata(text)
+
+
+async def extract_metadata_async(text):
+    """
+    Async variant of extract_metadata.
+    """
+    if GEMINI_AVAILABLE:
+        cached = _get_cached_result("metadata", text)
+        if cached is not None:
+            return cached
+
+        try:
+            prompt = _build_prompt(_METADATA_PROMPT, text)
+            response = await submit_gemini_prompt(prompt)
+
+            if response:
+                data = _parse_metadata_response(response)
+                _cache_result("metadata", text, data)
+                return data
+        except Exception as e:
+            print(f"[WARNING] Gemini metadata extraction failed: {e}. Using fallback.")
+
+    return _fallback_metadata(text)
+
+
 def transcribe_audio(audio_path):
     """
     Transcribe audio to text using Gemini API with fallback.
@@ -161,146 +602,177 @@ def transcribe_audio(audio_path):
         return "Transcription failed."
 
 
+def _parse_emotion_response(response):
+    """Map Gemini's emotion response onto one of the expected categories."""
+    # Clean and return emotion
+    emotion = response.strip()
+    # Validate emotion is one of expected categories
+    valid_emotions = [
+        "Anxious/Worried",
+        "Sad",
+        "Angry",
+        "Happy/Relieved",
+        "Joking",
+        "Concerned",
+    ]
+    for valid_emotion in valid_emotions:
+        if valid_emotion.lower() in emotion.lower():
+            return valid_emotion
+    return emotion  # Return as-is if not in list
+
+
+def _fallback_emotion(text):
+    """Simple keyword-based emotion detection used when Gemini is unavailable."""
+    try:
+        detected = {
+            _EMOTION_BY_KEYWORD[word] for word in _find_emotion_keywords(text.lower())
+        }
+
+        for emotion, _ in _EMOTION_KEYWORDS:
+            if emotion in detected:
+                return emotion
+
+        # Default to concerned
+        return "Concerned"
+
+    except Exception as e:
+        print(f"[ERROR] Fallback emotion analysis failed: {e}")
+        return "Unknown"
+
+
 def analyze_emotion(text):
     """
     Analyze emotion from text using Gemini API with fallback.
     """
     # Try Gemini API first
     if GEMINI_AVAILABLE:
+        cached = _get_cached_result("emotion", text)
+        if cached is not None:
+            return cached
+
         try:
-            prompt = EMOTION_ANALYSIS_PROMPT.format(text=text)
+            prompt = _build_prompt(_EMOTION_PROMPT, text)
             response = call_gemini_with_retry(prompt)
 
             if response:
-                # Clean and return emotion
-                emotion = response.strip()
-                # Validate emotion is one of expected categories
-                valid_emotions = [
-                    "Anxious/Worried",
-                    "Sad",
-                    "Angry",
-                    "Happy/Relieved",
-                    "Joking",
-                    "Concerned",
-                ]
-                for valid_emotion in valid_emotions:
-                    if valid_emotion.lower() in emotion.lower():
-                        return valid_emotion
-                return emotion  # Return as-is if not in list
+                emotion = _parse_emotion_response(response)
+                _cache_result("emotion", text, emotion)
+                return emotion
         except Exception as e:
             print(f"[WARNING] Gemini emotion analysis failed: {e}. Using fallback.")
 
-    # Fallback: Simple keyword-based emotion detection
-    try:
-        text_lower = text.lower()
-
-        # Check for joking/humor indicators
-        if any(
-            word in text_lower
-            for word in ["haha", "lol", "joke", "joking", "kidding", "funny", "laugh"]
-        ):
-            return "Joking"
-
-        # Check for happy/relieved
-        if any(
-            word in text_lower for word in ["happy", "relieved", "glad", "joy", "found"]
-        ):
-            return "Happy/Relieved"
-
-        # Check for worried/anxious
-        if any(
-            word in text_lower
-            for word in ["worried", "anxious", "scared", "afraid", "panic", "fear"]
-        ):
-            return "Anxious/Worried"
-
-        # Check for sad
-        if any(
-            word in text_lower
-            for word in ["sad", "crying", "depressed", "upset", "heartbroken"]
-        ):
-            return "Sad"
-
-        # Check for angry
-        if any(word in text_lower for word in ["angry", "furious", "mad", "rage"]):
-            return "Angry"
-
-        # Default to concerned
-        return "Concerned"
-
-    except Exception as e:
-        print(f"[ERROR] Fallback emotion analysis failed: {e}")
-        return "Unknown"
+    return _fallback_emotion(text)
 
 
-def extract_location_from_text(text):
+async def analyze_emotion_async(text):
     """
-    Extract Bhopal/Sehore location references from text using Gemini API with fallback.
+    Async variant of analyze_emotion.
     """
-    from config.bhopal_sehore_locations import get_location_by_name
-
-    # Try Gemini API first
     if GEMINI_AVAILABLE:
+        cached = _get_cached_result("emotion", text)
+        if cached is not None:
+            return cached
+
         try:
-            prompt = LOCATION_EXTRACTION_PROMPT.format(text=text)
-            response = call_gemini_with_retry(prompt)
+            prompt = _build_prompt(_EMOTION_PROMPT, text)
+            response = await submit_gemini_prompt(prompt)
 
             if response:
-                # Parse JSON response
-                response = response.strip()
-                if response.startswith("```json"):
-                    response = response[7:]
-                if response.startswith("```"):
-                    response = response[3:]
-                if response.endswith("```"):
-                    response = response[:-3]
-                response = response.strip()
-
-                data = json.loads(response)
-
-                if data.get("found") and data.get("name"):
-                    coords = get_location_by_name(data["name"])
-                    if coords:
-                        return {
-                            "name": data["name"],
-                            "lat": coords["lat"],
-                            "lon": coords["lon"],
-                            "geohash": coords["geohash"],
-                        }
+                emotion = _parse_emotion_response(response)
+                _cache_result("emotion", text, emotion)
+                return emotion
         except Exception as e:
-            print(f"[WARNING] Gemini location extraction failed: {e}. Using fallback.")
+            print(f"[WARNING] Gemini emotion analysis failed: {e}. Using fallback.")
+
+    return _fallback_emotion(text)
 
-    # Fallback: Simple keyword matching
+
+def _parse_location_response(response):
+    """
+    Parse Gemini's location JSON response.
+    Returns location dict, or None if no known location was found.
+    """
+    data = _json_loads(_strip_code_fence(response))
+
+    if data.get("found") and data.get("name"):
+        coords = get_location_by_name(data["name"])
+        if coords:
+            return {
+                "name": data["name"],
+                "lat": coords.lat,
+                "lon": coords.lon,
+                "geohash": coords.geohash,
+            }
+    return None
+
+
+def _fallback_location(text):
+    """Simple keyword matching used when Gemini is unavailable or finds nothing."""
     try:
-        text_lower = text.lower()
+        found = _find_location_names(text.lower())
 
         # Check for known locations
-        location_names = [
-            "bhopal junction",
-            "sehore bus stand",
-            "mp nagar",
-            "habibganj",
-            "new market",
-            "brts",
-            "roshanpura",
-            "sehore station",
-            "db mall",
-            "isbt",
-            "ashoka garden",
-        ]
-
-        for loc_name in location_names:
-            if loc_name in text_lower:
+        for loc_name in _FALLBACK_LOCATION_NAMES:
+            if loc_name in found:
                 coords = get_location_by_name(loc_name)
                 if coords:
                     return {
                         "name": loc_name,
-                        "lat": coords["lat"],
-                        "lon": coords["lon"],
-                        "geohash": coords["geohash"],
+                        "lat": coords.lat,
+                        "lon": coords.lon,
+                        "geohash": coords.geohash,
                     }
 
         return None
     except Exception as e:
         print(f"[ERROR] Fallback location extraction failed: {e}")
         return None
+
+
+def extract_location_from_text(text):
+    """
+    Extract Bhopal/Sehore location references from text using Gemini API with fallback.
+    """
+    # Try Gemini API first
+    if GEMINI_AVAILABLE:
+        cached = _get_cached_result("location", text)
+        if cached is not None:
+            return cached
+
+        try:
+            prompt = _build_prompt(_LOCATION_PROMPT, text)
+            response = call_gemini_with_retry(prompt)
+
+            if response:
+                location = _parse_location_response(response)
+                if location:
+                    _cache_result("location", text, location)
+                    return location
+        except Exception as e:
+            print(f"[WARNING] Gemini location extraction failed: {e}. Using fallback.")
+
+    return _fallback_location(text)
+
+
+async def extract_location_from_text_async(text):
+    """
+    Async variant of extract_location_from_text.
+    """
+    if GEMINI_AVAILABLE:
+        cached = _get_cached_result("location", text)
+        if cached is not None:
+            return cached
+
+        try:
+            prompt = _build_prompt(_LOCATION_PROMPT, text)
+            response = await submit_gemini_prompt(prompt)
+
+            if response:
+                location = _parse_location_response(response)
+                if location:
+                    _cache_result("location", text, location)
+                    return location
+        except Exception as e:
+            print(f"[WARNING] Gemini location extraction failed: {e}. Using fallback.")
+
+    return _fallback_location(text)
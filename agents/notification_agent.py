@@ -1,13 +1,22 @@
 """
 Notification Agent for email alerts and blockchain reports
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.notification_utils import send_match_notification, send_case_filed_notification
 from utils.blockchain_utils import create_blockchain_report
-from database import get_db_connection
+from database import db_connection
+
+# Module-level SQL so sqlite3's statement cache reuses the compiled statements
+_SELECT_CASE_SQL = "SELECT * FROM missing_cases WHERE id = ?"
+_INSERT_REPORT_SQL = """
+    INSERT INTO blockchain_reports (case_id, report_data, blockchain_hash)
+    VALUES (?, ?, ?)
+"""
+
+# Background workers so hashing, DB writes and SMTP stay off the scan loop
+_NOTIFY_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="notify")
 
 def notify_match_found(case_id, match_data, location_data):
     """
@@ -23,27 +32,25 @@ def notify_match_found(case_id, match_data, location_data):
         Dictionary with notification status and blockchain hash
     """
     try:
-        # Get case details from database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM missing_cases WHERE id = ?", (case_id,))
-        case_row = cursor.fetchone()
-        
-        if not case_row:
-            return {"success": False, "error": "Case not found"}
-        
-        case_data = dict(case_row)
-        
-        # Create blockchain report
-        blockchain_report = create_blockchain_report(case_id, match_data, location_data)
-        
-        # Save blockchain report to database
-        cursor.execute("""
-            INSERT INTO blockchain_reports (case_id, report_data, blockchain_hash)
-            VALUES (?, ?, ?)
-        """, (case_id, str(blockchain_report["report"]), blockchain_report["blockchain_hash"]))
-        
-        conn.commit()
+        with db_connection() as conn:
+            # Get case details from database
+            case_row = conn.execute(_SELECT_CASE_SQL, (case_id,)).fetchone()
+            
+            if not case_row:
+                return {"success": False, "error": "Case not found"}
+            
+            case_data = dict(case_row)
+            
+            # Create and serialize blockchain report before opening the write transaction
+            blockchain_report = create_blockchain_report(case_id, match_data, location_data)
+            report_data = json.dumps(blockchain_report["report"], sort_keys=True)
+            
+            # Save blockchain report to database (single commit)
+            with conn:
+                conn.execute(
+                    _INSERT_REPORT_SQL,
+                    (case_id, report_data, blockchain_report["blockchain_hash"])
+                )
         
         # Send email notification (if email is configured)
         email_sent = False
@@ -58,8 +65,6 @@ def notify_match_found(case_id, match_data, location_data):
                 blockchain_report["blockchain_hash"]
             )
         
-        conn.close()
-        
         return {
             "success": True,
             "blockchain_hash": blockchain_report["blockchain_hash"],
@@ -71,6 +76,15 @@ def notify_match_found(case_id, match_data, location_data):
         print(f"Error in notify_match_found: {e}")
         return {"success": False, "error": str(e)}
 
+def notify_match_found_background(case_id, match_data, location_data):
+    """
+    Queue notify_match_found on the background notification pool.
+    
+    Returns:
+        Future resolving to the notify_match_found result dictionary
+    """
+    return _NOTIFY_POOL.submit(notify_match_found, case_id, match_data, location_data)
+
 def notify_case_filed(case_id, route_prediction):
     """
     Send notification when a case is filed.
@@ -83,17 +97,14 @@ def notify_case_filed(case_id, route_prediction):
         Dictionary with notification status
     """
     try:
-        # Get case details from database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM missing_cases WHERE id = ?", (case_id,))
-        case_row = cursor.fetchone()
+        with db_connection() as conn:
+            # Get case details from database
+            case_row = conn.execute(_SELECT_CASE_SQL, (case_id,)).fetchone()
         
         if not case_row:
             return {"success": False, "error": "Case not found"}
         
         case_data = dict(case_row)
-        conn.close()
         
         # Send email notification (if email is configured)
         email_sent = False
@@ -3,8 +3,12 @@ PDF Report Generation Agent
 Generates detailed PDF reports for CCTV scan results
 """
 
+import io
 import os
-import sys
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import accumulate, islice
+from operator import itemgetter
 from datetime import datetime
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -14,15 +18,368 @@ from reportlab.platypus import (
     Paragraph,
     Spacer,
     Image,
-    Table,
-    TableStyle,
+    Flowable,
     PageBreak,
 )
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_db_connection
+from database import db_connection
+
+# Paragraph styles are built once at import and shared by every report
+_STYLES = getSampleStyleSheet()
+
+_CCTV_TITLE_STYLE = ParagraphStyle(
+    "CustomTitle",
+    parent=_STYLES["Heading1"],
+    fontSize=24,
+    textColor=colors.HexColor("#1a237e"),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+)
+
+_CCTV_HEADING_STYLE = ParagraphStyle(
+    "CustomHeading",
+    parent=_STYLES["Heading2"],
+    fontSize=16,
+    textColor=colors.HexColor("#283593"),
+    spaceAfter=12,
+    spaceBefore=12,
+)
+
+_AGGREGATE_TITLE_STYLE = ParagraphStyle(
+    "CustomTitle",
+    parent=_STYLES["Heading1"],
+    fontSize=26,
+    textColor=colors.HexColor("#0d47a1"),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+)
+
+_AGGREGATE_HEADING_STYLE = ParagraphStyle(
+    "CustomHeading",
+    parent=_STYLES["Heading2"],
+    fontSize=16,
+    textColor=colors.HexColor("#1565c0"),
+    spaceAfter=12,
+    spaceBefore=12,
+)
+
+# Match / no-match result line in the CCTV report
+_RESULT_FOUND_STYLE = ParagraphStyle(
+    "ResultStyle",
+    parent=_STYLES["Normal"],
+    fontSize=12,
+    textColor=colors.HexColor("#2e7d32"),
+)
+_RESULT_NOT_FOUND_STYLE = ParagraphStyle(
+    "ResultStyle",
+    parent=_STYLES["Normal"],
+    fontSize=12,
+    textColor=colors.HexColor("#c62828"),
+)
+
+# Conclusion line in the aggregate report
+_CONCLUSION_FOUND_STYLE = ParagraphStyle(
+    "Conclusion",
+    parent=_STYLES["Normal"],
+    fontSize=12,
+    textColor=colors.HexColor("#2e7d32"),
+)
+_CONCLUSION_NOT_FOUND_STYLE = ParagraphStyle(
+    "Conclusion",
+    parent=_STYLES["Normal"],
+    fontSize=12,
+    textColor=colors.HexColor("#d32f2f"),
+)
+
+# Match fields shown in the "Match Details" table, pulled out as one tuple
+_MATCH_ROW_FIELDS = itemgetter("frame", "similarity", "confidence", "timestamp")
+
+# Cell geometry for _GridTable (matches the old platypus Table defaults)
+_CELL_FONT_SIZE = 10
+_CELL_LEADING = 12
+_CELL_LEFT_PADDING = 6
+_CELL_TOP_PADDING = 3
+_HEADER_FONT_SIZE = 11
+_HEADER_BOTTOM_PADDING = 12
+
+# Shared _GridTable settings for the header-row tables (match details, CCTV results)
+_HEADER_TABLE_OPTIONS = {
+    "grid_color": colors.black,
+    "align": "CENTER",
+    "bottom_padding": _CELL_TOP_PADDING,
+}
+
+
+@lru_cache(maxsize=None)
+def _parsed_fragments(text, style):
+    """Parse the markup of a fixed report string once per process."""
+    return Paragraph(text, style).frags
+
+
+def _static_paragraph(text, style):
+    """
+    Paragraph for text that is the same in every report (titles, headings).
+    Reuses the parsed fragments instead of running the markup parser again.
+    """
+    return Paragraph(text, style, frags=_parsed_fragments(text, style))
+
+
+class _GridTable(Flowable):
+    """
+    Small fixed-shape table drawn directly on the canvas.
+
+    Column widths and row heights are known up front, so there is no
+    column-width negotiation or cell wrapping as with platypus Table.
+    Cells hold single-line text, like the plain strings the reports use.
+
+    Without header_background the first column is a bold label column
+    filled with background; with it the first row is a bold header and
+    background fills the body rows.
+    """
+
+    def __init__(
+        self,
+        data,
+        col_widths,
+        background,
+        header_background=None,
+        header_text_color=colors.whitesmoke,
+        grid_color=colors.grey,
+        align="LEFT",
+        bottom_padding=8,
+    ):
+        Flowable.__init__(self)
+        self.hAlign = "CENTER"
+        self.data = data
+        self.col_widths = col_widths
+        self.background = background
+        self.header_background = header_background
+        self.header_text_color = header_text_color
+        self.grid_color = grid_color
+        self.align = align
+        self.bottom_padding = bottom_padding
+
+        self.row_heights = [
+            _CELL_LEADING + _CELL_TOP_PADDING + self._bottom_padding(row_idx)
+            for row_idx in range(len(data))
+        ]
+        self.width = sum(col_widths)
+        # Running bottom edge of each row, for finding page breaks by bisection
+        self.row_bottoms = list(accumulate(self.row_heights))
+        self.height = self.row_bottoms[-1] if self.row_bottoms else 0
+
+    def _is_header(self, row_idx):
+        return self.header_background is not None and row_idx == 0
+
+    def _bottom_padding(self, row_idx):
+        if self._is_header(row_idx):
+            return _HEADER_BOTTOM_PADDING
+        return self.bottom_padding
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Break between rows; a header row is repeated on the continuation
+        fits = bisect_right(self.row_bottoms, availHeight)
+
+        header_rows = 1 if self.header_background is not None else 0
+        if fits <= header_rows or fits == len(self.data):
+            return []
+
+        rest = self.data[:header_rows] + self.data[fits:]
+        return [self._with_rows(self.data[:fits]), self._with_rows(rest)]
+
+    def _with_rows(self, data):
+        return _GridTable(
+            data,
+            self.col_widths,
+            self.background,
+            header_background=self.header_background,
+            header_text_color=self.header_text_color,
+            grid_color=self.grid_color,
+            align=self.align,
+            bottom_padding=self.bottom_padding,
+        )
+
+    def draw(self):
+        canvas = self.canv
+        xs = [0]
+        for col_width in self.col_widths:
+            xs.append(xs[-1] + col_width)
+
+        y = self.height
+        ys = [y]
+        for row_idx, row in enumerate(self.data):
+            row_height = self.row_heights[row_idx]
+            y -= row_height
+            ys.append(y)
+            header = self._is_header(row_idx)
+
+            # Cell backgrounds
+            if header:
+                canvas.setFillColor(self.header_background)
+                canvas.rect(0, y, self.width, row_height, stroke=0, fill=1)
+            elif self.header_background is not None:
+                canvas.setFillColor(self.background)
+                canvas.rect(0, y, self.width, row_height, stroke=0, fill=1)
+            else:
+                canvas.setFillColor(self.background)
+                canvas.rect(0, y, self.col_widths[0], row_height, stroke=0, fill=1)
+
+            # Cell text
+            font_size = _HEADER_FONT_SIZE if header else _CELL_FONT_SIZE
+            baseline = y + self._bottom_padding(row_idx) + _CELL_LEADING - font_size
+            canvas.setFillColor(self.header_text_color if header else colors.black)
+            for col_idx, value in enumerate(row):
+                text = "" if value is None else str(value)
+                bold = header or (self.header_background is None and col_idx == 0)
+                canvas.setFont("Helvetica-Bold" if bold else "Helvetica", font_size)
+                if self.align == "CENTER":
+                    center = (xs[col_idx] + xs[col_idx + 1]) / 2
+                    canvas.drawCentredString(center, baseline, text)
+                else:
+                    canvas.drawString(xs[col_idx] + _CELL_LEFT_PADDING, baseline, text)
+
+        # Grid lines
+        canvas.setStrokeColor(self.grid_color)
+        canvas.setLineWidth(1)
+        canvas.grid(xs, ys)
+
+
+def _write_atomically(path, data):
+    """Write data to a temp file beside path in one write, then rename it over path."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _build_pdf(story, filepath):
+    """
+    Build the PDF in memory and publish it at filepath atomically, so a
+    crash mid-build never leaves a truncated report behind.
+    Returns the PDF bytes.
+    """
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=letter).build(story)
+    pdf_bytes = buffer.getvalue()
+    _write_atomically(filepath, pdf_bytes)
+    return pdf_bytes
+
+
+def _scan_summary_table(total_frames, matches_found, scan_timestamp):
+    """Frames / matches / timestamp table at the top of the CCTV scan results."""
+    scan_summary = [
+        ["Total Frames Processed:", str(total_frames)],
+        ["Matches Found:", str(matches_found)],
+        ["Scan Timestamp:", scan_timestamp],
+    ]
+    return _GridTable(
+        scan_summary,
+        [2.5 * inch, 3.5 * inch],
+        colors.HexColor("#fff3e0"),
+    )
+
+
+def _no_match_results(scan_data, scan_timestamp):
+    """
+    Scan Results section for a successful scan without matches - the
+    common case, so it skips the match table and frame images entirely.
+    """
+    return [
+        _static_paragraph("<b>✗ NO MATCHES FOUND</b>", _RESULT_NOT_FOUND_STYLE),
+        Spacer(1, 0.2 * inch),
+        _scan_summary_table(
+            scan_data.get("total_frames", 0),
+            scan_data.get("matches_found", 0),
+            scan_timestamp,
+        ),
+        Spacer(1, 0.3 * inch),
+    ]
+
+
+def _match_results(scan_data, scan_timestamp):
+    """Scan Results section for a scan with matches: summary, match table and frames."""
+    matches_found = scan_data["matches_found"]
+    heading_style = _CCTV_HEADING_STYLE
+    section = [
+        Paragraph(f"<b>✓ MATCHES FOUND: {matches_found}</b>", _RESULT_FOUND_STYLE),
+        Spacer(1, 0.2 * inch),
+        _scan_summary_table(
+            scan_data.get("total_frames", 0), matches_found, scan_timestamp
+        ),
+        Spacer(1, 0.3 * inch),
+    ]
+
+    # Match Details
+    section.append(_static_paragraph("Match Details", heading_style))
+
+    matches = scan_data.get("matches", [])
+    match_data = [["Frame", "Similarity", "Confidence", "Timestamp"]]
+
+    # Limit to first 10 matches
+    for frame, similarity, confidence, timestamp in map(
+        _MATCH_ROW_FIELDS, islice(matches, 10)
+    ):
+        match_data.append(
+            [
+                str(frame),
+                f"{similarity:.4f}",
+                f"{confidence:.2f}",
+                timestamp,
+            ]
+        )
+
+    match_table = _GridTable(
+        match_data,
+        [1.5 * inch, 1.5 * inch, 1.5 * inch, 1.5 * inch],
+        colors.beige,
+        header_background=colors.HexColor("#1976d2"),
+        **_HEADER_TABLE_OPTIONS,
+    )
+    section.append(match_table)
+
+    # Add matched images if available
+    section.append(Spacer(1, 0.3 * inch))
+    section.append(_static_paragraph("Matched Frames", heading_style))
+
+    for match in matches[:3]:  # Show first 3 images
+        # Prefer the thumbnail written at scan time
+        img_path = match.get("thumb_path") or match.get("image_path")
+        if img_path and os.path.exists(img_path):
+            try:
+                img = Image(img_path, width=4 * inch, height=3 * inch)
+                section.append(img)
+                section.append(
+                    Paragraph(
+                        f"Frame {match['frame']} - Similarity: {match['similarity']:.4f}",
+                        _STYLES["Normal"],
+                    )
+                )
+                section.append(Spacer(1, 0.2 * inch))
+            except Exception as e:
+                print(f"[WARNING] Could not add image {img_path}: {e}")
+
+    return section
+
+
+# Only the columns the CCTV report renders (skips the embedding blob etc.)
+_CCTV_REPORT_CASE_SQL = """
+    SELECT id, name, age, last_seen_location, date_reported, emotion
+    FROM missing_cases WHERE id = ?
+"""
+_CCTV_REPORT_LOCATION_SQL = """
+    SELECT id, name, type, lat, lon, video_path
+    FROM cctv_locations WHERE id = ?
+"""
 
 
 def generate_cctv_scan_report(case_id, cctv_id, scan_data, output_dir="reports"):
@@ -42,60 +399,40 @@ def generate_cctv_scan_report(case_id, cctv_id, scan_data, output_dir="reports")
         os.makedirs(output_dir, exist_ok=True)
 
         # Get case and CCTV details from database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM missing_cases WHERE id = ?", (case_id,))
-        case_row = cursor.fetchone()
-        if not case_row:
-            print(f"[ERROR] Case {case_id} not found")
-            return None
-        case = dict(case_row)
-
-        cursor.execute("SELECT * FROM cctv_locations WHERE id = ?", (cctv_id,))
-        cctv_row = cursor.fetchone()
-        if not cctv_row:
-            print(f"[ERROR] CCTV {cctv_id} not found")
-            return None
-        cctv = dict(cctv_row)
-
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+
+            cursor.execute(_CCTV_REPORT_CASE_SQL, (case_id,))
+            case_row = cursor.fetchone()
+            if not case_row:
+                print(f"[ERROR] Case {case_id} not found")
+                return None
+            case = dict(case_row)
+
+            cursor.execute(_CCTV_REPORT_LOCATION_SQL, (cctv_id,))
+            cctv_row = cursor.fetchone()
+            if not cctv_row:
+                print(f"[ERROR] CCTV {cctv_id} not found")
+                return None
+            cctv = dict(cctv_row)
 
         # Create PDF filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        scan_timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
         filename = f"case{case_id}_cctv{cctv_id}_{timestamp}.pdf"
         filepath = os.path.join(output_dir, filename)
 
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
         story = []
-        styles = getSampleStyleSheet()
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=24,
-            textColor=colors.HexColor("#1a237e"),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-        )
-
-        heading_style = ParagraphStyle(
-            "CustomHeading",
-            parent=styles["Heading2"],
-            fontSize=16,
-            textColor=colors.HexColor("#283593"),
-            spaceAfter=12,
-            spaceBefore=12,
-        )
+        title_style = _CCTV_TITLE_STYLE
+        heading_style = _CCTV_HEADING_STYLE
 
         # Title
-        story.append(Paragraph("CCTV Scan Report", title_style))
+        story.append(_static_paragraph("CCTV Scan Report", title_style))
         story.append(Spacer(1, 0.2 * inch))
 
         # Case Information
-        story.append(Paragraph("Case Information", heading_style))
+        story.append(_static_paragraph("Case Information", heading_style))
         case_data = [
             ["Case ID:", str(case["id"])],
             ["Name:", case["name"]],
@@ -104,25 +441,16 @@ def generate_cctv_scan_report(case_id, cctv_id, scan_data, output_dir="reports")
             ["Date Reported:", case["date_reported"]],
             ["Emotion:", case["emotion"]],
         ]
-        case_table = Table(case_data, colWidths=[2 * inch, 4 * inch])
-        case_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#e3f2fd")),
-                    ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.grey),
-                ]
-            )
+        case_table = _GridTable(
+            case_data,
+            [2 * inch, 4 * inch],
+            colors.HexColor("#e3f2fd"),
         )
         story.append(case_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # CCTV Information
-        story.append(Paragraph("CCTV Location", heading_style))
+        story.append(_static_paragraph("CCTV Location", heading_style))
         cctv_data = [
             ["CCTV ID:", str(cctv["id"])],
             ["Name:", cctv["name"]],
@@ -130,136 +458,29 @@ def generate_cctv_scan_report(case_id, cctv_id, scan_data, output_dir="reports")
             ["Location:", f"Lat: {cctv['lat']}, Lon: {cctv['lon']}"],
             ["Video Path:", cctv["video_path"]],
         ]
-        cctv_table = Table(cctv_data, colWidths=[2 * inch, 4 * inch])
-        cctv_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#e8f5e9")),
-                    ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.grey),
-                ]
-            )
+        cctv_table = _GridTable(
+            cctv_data,
+            [2 * inch, 4 * inch],
+            colors.HexColor("#e8f5e9"),
         )
         story.append(cctv_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # Scan Results
-        story.append(Paragraph("Scan Results", heading_style))
-
-        if scan_data.get("success"):
-            matches_found = scan_data.get("matches_found", 0)
-            total_frames = scan_data.get("total_frames", 0)
-
-            result_style = ParagraphStyle(
-                "ResultStyle",
-                parent=styles["Normal"],
-                fontSize=12,
-                textColor=(
-                    colors.HexColor("#2e7d32")
-                    if matches_found > 0
-                    else colors.HexColor("#c62828")
-                ),
-            )
-
-            if matches_found > 0:
-                story.append(
-                    Paragraph(f"<b>✓ MATCHES FOUND: {matches_found}</b>", result_style)
-                )
-            else:
-                story.append(Paragraph("<b>✗ NO MATCHES FOUND</b>", result_style))
-
-            story.append(Spacer(1, 0.2 * inch))
+        story.append(_static_paragraph("Scan Results", heading_style))
 
-            scan_summary = [
-                ["Total Frames Processed:", str(total_frames)],
-                ["Matches Found:", str(matches_found)],
-                ["Scan Timestamp:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-            ]
-            summary_table = Table(scan_summary, colWidths=[2.5 * inch, 3.5 * inch])
-            summary_table.setStyle(
-                TableStyle(
-                    [
-                        ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#fff3e0")),
-                        ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                        ("FONTSIZE", (0, 0), (-1, -1), 10),
-                        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                        ("GRID", (0, 0), (-1, -1), 1, colors.grey),
-                    ]
-                )
-            )
-            story.append(summary_table)
-            story.append(Spacer(1, 0.3 * inch))
-
-            # Match Details
-            if matches_found > 0:
-                story.append(Paragraph("Match Details", heading_style))
-
-                matches = scan_data.get("matches", [])
-                match_data = [["Frame", "Similarity", "Confidence", "Timestamp"]]
-
-                for match in matches[:10]:  # Limit to first 10 matches
-                    match_data.append(
-                        [
-                            str(match["frame"]),
-                            f"{match['similarity']:.4f}",
-                            f"{match['confidence']:.2f}",
-                            match["timestamp"],
-                        ]
-                    )
-
-                match_table = Table(
-                    match_data,
-                    colWidths=[1.5 * inch, 1.5 * inch, 1.5 * inch, 1.5 * inch],
-                )
-                match_table.setStyle(
-                    TableStyle(
-                        [
-                            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1976d2")),
-                            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                            ("FONTSIZE", (0, 0), (-1, 0), 11),
-                            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                            ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-                            ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                        ]
-                    )
-                )
-                story.append(match_table)
-
-                # Add matched images if available
-                story.append(Spacer(1, 0.3 * inch))
-                story.append(Paragraph("Matched Frames", heading_style))
-
-                for idx, match in enumerate(matches[:3]):  # Show first 3 images
-                    img_path = match.get("image_path")
-                    if img_path and os.path.exists(img_path):
-                        try:
-                            img = Image(img_path, width=4 * inch, height=3 * inch)
-                            story.append(img)
-                            story.append(
-                                Paragraph(
-                                    f"Frame {match['frame']} - Similarity: {match['similarity']:.4f}",
-                                    styles["Normal"],
-                                )
-                            )
-                            story.append(Spacer(1, 0.2 * inch))
-                        except Exception as e:
-                            print(f"[WARNING] Could not add image {img_path}: {e}")
-        else:
+        if not scan_data.get("success"):
             error_msg = scan_data.get("error", "Unknown error")
             story.append(
-                Paragraph(f"<b>Scan Failed:</b> {error_msg}", styles["Normal"])
+                Paragraph(f"<b>Scan Failed:</b> {error_msg}", _STYLES["Normal"])
             )
+        elif scan_data.get("matches_found", 0) > 0:
+            story.extend(_match_results(scan_data, scan_timestamp))
+        else:
+            story.extend(_no_match_results(scan_data, scan_timestamp))
 
         # Build PDF
-        doc.build(story)
+        _build_pdf(story, filepath)
 
         print(f"[INFO] Generated CCTV scan report: {filepath}")
         return filepath
@@ -269,6 +490,23 @@ def generate_cctv_scan_report(case_id, cctv_id, scan_data, output_dir="reports")
         return None
 
 
+# Rows of the aggregate "CCTV Scan Results" table, formatted by SQLite as
+# ready-to-draw strings (detections, duration to 2 d.p. or N/A, status)
+_AGGREGATE_RESULTS_SQL = """
+    SELECT cl.name,
+           cl.type,
+           CAST(csr.detections_found AS TEXT),
+           CASE WHEN csr.scan_duration_seconds
+                THEN printf('%.2f', csr.scan_duration_seconds)
+                ELSE 'N/A' END,
+           CASE WHEN csr.detections_found >= 0
+                THEN '✓ Complete' ELSE '✗ Failed' END
+    FROM cctv_scan_results csr
+    JOIN cctv_locations cl ON csr.cctv_id = cl.id
+    WHERE csr.scan_task_id = ?
+"""
+
+
 def generate_aggregate_report(case_id, scan_task_id, output_dir="reports"):
     """
     Generate aggregate PDF report for all CCTV scans in a case.
@@ -284,74 +522,61 @@ def generate_aggregate_report(case_id, scan_task_id, output_dir="reports"):
     try:
         os.makedirs(output_dir, exist_ok=True)
 
-        # Get case and scan results from database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM missing_cases WHERE id = ?", (case_id,))
-        case_row = cursor.fetchone()
-        if not case_row:
-            print(f"[ERROR] Case {case_id} not found")
-            return None
-        case = dict(case_row)
-
-        cursor.execute("SELECT * FROM scan_tasks WHERE id = ?", (scan_task_id,))
-        scan_task_row = cursor.fetchone()
-        if not scan_task_row:
-            print(f"[ERROR] Scan task {scan_task_id} not found")
-            return None
-        scan_task = dict(scan_task_row)
-
-        cursor.execute(
-            """
-            SELECT csr.*, cl.name as cctv_name, cl.type as cctv_type
-            FROM cctv_scan_results csr
-            JOIN cctv_locations cl ON csr.cctv_id = cl.id
-            WHERE csr.scan_task_id = ?
-        """,
-            (scan_task_id,),
-        )
-        scan_results = [dict(row) for row in cursor.fetchall()]
-
-        conn.close()
+        # Case, scan task and detection total come back in one query; the
+        # per-CCTV rows are streamed straight into the results table rows
+        with db_connection() as conn:
+            row = conn.execute(
+                """
+                SELECT mc.id, mc.name, mc.age, mc.last_seen_location,
+                       mc.time_lost, mc.date_reported, mc.status,
+                       st.scanned_cctvs AS task_scanned_cctvs,
+                       st.started_at AS task_started_at,
+                       st.completed_at AS task_completed_at,
+                       st.status AS task_status,
+                       (SELECT SUM(detections_found) FROM cctv_scan_results
+                        WHERE scan_task_id = st.id) AS total_detections
+                FROM missing_cases mc, scan_tasks st
+                WHERE mc.id = ? AND st.id = ?
+            """,
+                (case_id, scan_task_id),
+            ).fetchone()
+            if not row:
+                print(f"[ERROR] Case {case_id} or scan task {scan_task_id} not found")
+                return None
+
+            case = dict(row)
+            scan_task = {
+                key: case.pop(f"task_{key}")
+                for key in ("scanned_cctvs", "started_at", "completed_at", "status")
+            }
+            total_detections = case.pop("total_detections") or 0
+
+            results_data = [
+                ["CCTV Name", "Type", "Detections", "Duration (s)", "Status"]
+            ]
+            results_data.extend(
+                map(list, conn.execute(_AGGREGATE_RESULTS_SQL, (scan_task_id,)))
+            )
 
         # Create PDF filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"case{case_id}_aggregate_{timestamp}.pdf"
         filepath = os.path.join(output_dir, filename)
 
-        # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
         story = []
-        styles = getSampleStyleSheet()
-
-        # Custom styles
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=26,
-            textColor=colors.HexColor("#0d47a1"),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-        )
-
-        heading_style = ParagraphStyle(
-            "CustomHeading",
-            parent=styles["Heading2"],
-            fontSize=16,
-            textColor=colors.HexColor("#1565c0"),
-            spaceAfter=12,
-            spaceBefore=12,
-        )
+        title_style = _AGGREGATE_TITLE_STYLE
+        heading_style = _AGGREGATE_HEADING_STYLE
 
         # Title
         story.append(
-            Paragraph("Missing Person Case - Aggregate Scan Report", title_style)
+            _static_paragraph(
+                "Missing Person Case - Aggregate Scan Report", title_style
+            )
         )
         story.append(Spacer(1, 0.2 * inch))
 
         # Case Information
-        story.append(Paragraph("Case Information", heading_style))
+        story.append(_static_paragraph("Case Information", heading_style))
         case_data = [
             ["Case ID:", str(case["id"])],
             ["Name:", case["name"]],
@@ -361,26 +586,16 @@ def generate_aggregate_report(case_id, scan_task_id, output_dir="reports"):
             ["Date Reported:", case["date_reported"]],
             ["Status:", case["status"]],
         ]
-        case_table = Table(case_data, colWidths=[2 * inch, 4 * inch])
-        case_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#e1f5fe")),
-                    ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.grey),
-                ]
-            )
+        case_table = _GridTable(
+            case_data,
+            [2 * inch, 4 * inch],
+            colors.HexColor("#e1f5fe"),
         )
         story.append(case_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # Scan Task Summary
-        story.append(Paragraph("Scan Task Summary", heading_style))
-        total_detections = sum(result["detections_found"] for result in scan_results)
+        story.append(_static_paragraph("Scan Task Summary", heading_style))
 
         task_data = [
             ["Total CCTVs Scanned:", str(scan_task["scanned_cctvs"])],
@@ -389,86 +604,40 @@ def generate_aggregate_report(case_id, scan_task_id, output_dir="reports"):
             ["Completed At:", scan_task.get("completed_at", "N/A")],
             ["Status:", scan_task["status"]],
         ]
-        task_table = Table(task_data, colWidths=[2.5 * inch, 3.5 * inch])
-        task_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#f3e5f5")),
-                    ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 10),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.grey),
-                ]
-            )
+        task_table = _GridTable(
+            task_data,
+            [2.5 * inch, 3.5 * inch],
+            colors.HexColor("#f3e5f5"),
         )
         story.append(task_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # Individual CCTV Results
-        story.append(Paragraph("CCTV Scan Results", heading_style))
-
-        results_data = [["CCTV Name", "Type", "Detections", "Duration (s)", "Status"]]
-
-        for result in scan_results:
-            results_data.append(
-                [
-                    result["cctv_name"],
-                    result["cctv_type"],
-                    str(result["detections_found"]),
-                    (
-                        f"{result['scan_duration_seconds']:.2f}"
-                        if result["scan_duration_seconds"]
-                        else "N/A"
-                    ),
-                    "✓ Complete" if result["detections_found"] >= 0 else "✗ Failed",
-                ]
-            )
-
-        results_table = Table(
-            results_data, colWidths=[2 * inch, 1 * inch, 1 * inch, 1 * inch, 1.5 * inch]
-        )
-        results_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#43a047")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 11),
-                    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                    ("BACKGROUND", (0, 1), (-1, -1), colors.lightgrey),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                ]
-            )
+        story.append(_static_paragraph("CCTV Scan Results", heading_style))
+
+        results_table = _GridTable(
+            results_data,
+            [2 * inch, 1 * inch, 1 * inch, 1 * inch, 1.5 * inch],
+            colors.lightgrey,
+            header_background=colors.HexColor("#43a047"),
+            **_HEADER_TABLE_OPTIONS,
         )
         story.append(results_table)
         story.append(Spacer(1, 0.3 * inch))
 
         # Conclusion
-        story.append(Paragraph("Conclusion", heading_style))
+        story.append(_static_paragraph("Conclusion", heading_style))
         if total_detections > 0:
             conclusion_text = f"<b>PERSON POTENTIALLY FOUND!</b> Total of {total_detections} detection(s) across {scan_task['scanned_cctvs']} CCTV location(s). Please review individual CCTV reports for detailed match information."
-            conclusion_style = ParagraphStyle(
-                "Conclusion",
-                parent=styles["Normal"],
-                fontSize=12,
-                textColor=colors.HexColor("#2e7d32"),
-            )
+            conclusion_style = _CONCLUSION_FOUND_STYLE
         else:
             conclusion_text = f"No matches found across {scan_task['scanned_cctvs']} CCTV location(s). Monitoring will continue."
-            conclusion_style = ParagraphStyle(
-                "Conclusion",
-                parent=styles["Normal"],
-                fontSize=12,
-                textColor=colors.HexColor("#d32f2f"),
-            )
+            conclusion_style = _CONCLUSION_NOT_FOUND_STYLE
 
         story.append(Paragraph(conclusion_text, conclusion_style))
 
-        # Build PDF
-        doc.build(story)
+        # Build PDF (not cached: started_at/completed_at differ on every scan task)
+        _build_pdf(story, filepath)
 
         print(f"[INFO] Generated aggregate scan report: {filepath}")
         return filepath
@@ -3,29 +3,32 @@ Background CCTV Scanning Agent
 Manages background scanning tasks for CCTV footage
 """
 
-import sys
 import os
+import asyncio
 import threading
+import multiprocessing
 import time
 from datetime import datetime
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import aiosqlite
+from PIL import Image
+
 from surveillance import surveillance_yolo_deepface
-from database import get_db_connection
+from database import DB_PATH, db_connection
 from agents.report_agent import generate_cctv_scan_report, generate_aggregate_report
-from agents.notification_agent import notify_match_found
+from agents.notification_agent import notify_match_found_background
 from utils.notification_utils import send_scan_complete_notification
 from utils.websocket_utils import (
     notify_scan_started,
     notify_scan_progress,
     notify_scan_complete,
-    notify_match_found_realtime,
+    notify_match_found_realtime_background,
 )
 
 
 def start_background_scan(case_id, cctv_list, target_image_path):
     """
-    Start background CCTV scanning in a separate thread.
+    Start background CCTV scanning on the shared scan event loop.
 
     Args:
         case_id: Case ID
@@ -37,35 +40,32 @@ def start_background_scan(case_id, cctv_list, target_image_path):
     """
     try:
         # Create scan task in database
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute(
-            """
-            INSERT INTO scan_tasks (case_id, status, total_cctvs, started_at)
-            VALUES (?, ?, ?, ?)
-        """,
-            (
-                case_id,
-                "pending",
-                len(cctv_list),
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            ),
-        )
+            cursor.execute(
+                """
+                INSERT INTO scan_tasks (case_id, status, total_cctvs, started_at)
+                VALUES (?, ?, ?, ?)
+            """,
+                (
+                    case_id,
+                    "pending",
+                    len(cctv_list),
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
 
-        scan_task_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+            scan_task_id = cursor.lastrowid
+            conn.commit()
 
         print(f"[INFO] Created scan task {scan_task_id} for case {case_id}")
 
-        # Start background thread
-        thread = threading.Thread(
-            target=_run_background_scan,
-            args=(scan_task_id, case_id, cctv_list, target_image_path),
-            daemon=True,
+        # Hand the scan to the background event loop
+        asyncio.run_coroutine_threadsafe(
+            _run_background_scan(scan_task_id, case_id, cctv_list, target_image_path),
+            _get_scan_loop(),
         )
-        thread.start()
 
         return scan_task_id
 
@@ -74,87 +74,168 @@ def start_background_scan(case_id, cctv_list, target_image_path):
         return None
 
 
-def _run_background_scan(scan_task_id, case_id, cctv_list, target_image_path):
+# All background scans share one event loop running in a daemon thread
+_scan_loop = None
+_scan_loop_lock = threading.Lock()
+
+
+def _get_scan_loop():
+    """Get the background scan event loop, starting its thread on first use."""
+    global _scan_loop
+    with _scan_loop_lock:
+        if _scan_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="scan-loop", daemon=True
+            ).start()
+            _scan_loop = loop
+    return _scan_loop
+
+
+# Per-CCTV scan results are buffered and inserted every
+# SCAN_RESULT_FLUSH_INTERVAL CCTVs (and once more at the end of the scan);
+# the one-row scanned_cctvs progress update is written after every CCTV
+SCAN_RESULT_FLUSH_INTERVAL = 5
+
+_INSERT_SCAN_RESULT_SQL = """
+    INSERT INTO cctv_scan_results
+    (scan_task_id, cctv_id, video_path, detections_found, scan_duration_seconds, report_path)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_UPDATE_PROGRESS_SQL = "UPDATE scan_tasks SET scanned_cctvs = ? WHERE id = ?"
+
+_UPDATE_REPORT_PATH_SQL = """
+    UPDATE cctv_scan_results SET report_path = ?
+    WHERE scan_task_id = ? AND cctv_id = ?
+"""
+
+_COMPLETE_SCAN_TASK_SQL = """
+    UPDATE scan_tasks
+    SET status = 'completed', completed_at = ?, pdf_report_path = ?,
+        total_detections = (
+            SELECT COALESCE(SUM(detections_found), 0)
+            FROM cctv_scan_results WHERE scan_task_id = scan_tasks.id
+        )
+    WHERE id = ?
+    RETURNING total_detections
+"""
+
+# Completed tasks carry their stored total; running ones are summed on the
+# fly (served by idx_csr_scan_task)
+_SCAN_STATUS_SQL = """
+    SELECT st.id, st.case_id, st.status, st.total_cctvs, st.scanned_cctvs,
+           st.started_at, st.completed_at, st.pdf_report_path,
+           COALESCE(
+               st.total_detections,
+               (SELECT SUM(detections_found) FROM cctv_scan_results
+                WHERE scan_task_id = st.id),
+               0
+           ) AS total_detections
+    FROM scan_tasks st
+    WHERE st.id = ?
+"""
+
+
+async def _run_background_scan(scan_task_id, case_id, cctv_list, target_image_path):
     """
-    Internal function to run background scan (runs in separate thread).
+    Internal coroutine to run a background scan (runs on the scan event loop).
+    All database writes for the scan go through a single aiosqlite connection;
+    blocking scan, report and email work runs in worker threads.
     """
+    db = None
     try:
         print(f"[INFO] Starting background scan for task {scan_task_id}")
 
         # Notify dashboard that scan started
         notify_scan_started(case_id, scan_task_id, len(cctv_list))
 
+        db = await aiosqlite.connect(DB_PATH)
+        db.row_factory = aiosqlite.Row
+        await db.execute("PRAGMA synchronous=NORMAL")
+
         # Update status to in_progress
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
+        await db.execute(
             """
             UPDATE scan_tasks SET status = 'in_progress' WHERE id = ?
         """,
             (scan_task_id,),
         )
-        conn.commit()
-        conn.close()
-
-        # Scan each CCTV
-        for idx, cctv in enumerate(cctv_list):
-            print(f"[INFO] Scanning CCTV {idx + 1}/{len(cctv_list)}: {cctv['name']}")
-
-            scan_result = scan_single_cctv(
-                scan_task_id, case_id, cctv, target_image_path
-            )
-
-            # Update progress
-            update_scan_progress(scan_task_id, idx + 1)
+        await db.commit()
+
+        # Scan CCTVs concurrently - each scan is an independent video decode
+        # plus inference job, capped at one per CPU
+        pending_results = []
+        pending_reports = []
+        flush_lock = asyncio.Lock()
+        semaphore = asyncio.Semaphore(max(1, min(len(cctv_list), os.cpu_count() or 1)))
+        scanned_count = 0
+
+        async def scan_and_record(cctv):
+            nonlocal scanned_count
+            rows = []
+            async with semaphore:
+                scan_result = await scan_single_cctv_async(
+                    scan_task_id, case_id, cctv, target_image_path, rows
+                )
+
+            scanned_count += 1
+            count = scanned_count
+            print(f"[INFO] Scanned CCTV {count}/{len(cctv_list)}: {cctv['name']}")
+            pending_results.extend(rows)
+            if rows:
+                pending_reports.append((case_id, cctv["cctv_id"], scan_result))
+
+            # Progress every CCTV; buffered result rows every few CCTVs
+            insert_results = count % SCAN_RESULT_FLUSH_INTERVAL == 0 or count == len(cctv_list)
+            async with flush_lock:
+                await _flush_scan_results(
+                    db, scan_task_id, pending_results, count, insert_results
+                )
 
             # Notify dashboard of progress
-            notify_scan_progress(case_id, scan_task_id, idx + 1, len(cctv_list))
-
-            # Small delay between scans
-            time.sleep(1)
+            notify_scan_progress(case_id, scan_task_id, count, len(cctv_list))
+
+        await asyncio.gather(*(scan_and_record(cctv) for cctv in cctv_list))
+
+        # Build the per-CCTV PDFs now that scanning is done, then record their paths
+        print(f"[INFO] Generating {len(pending_reports)} CCTV report(s) for task {scan_task_id}")
+        report_paths = await asyncio.to_thread(_generate_cctv_reports, pending_reports)
+        await db.executemany(
+            _UPDATE_REPORT_PATH_SQL,
+            [
+                (report_path, scan_task_id, cctv_id)
+                for (_, cctv_id, _), report_path in zip(pending_reports, report_paths)
+            ],
+        )
+        await db.commit()
 
         # Generate aggregate report
         print(f"[INFO] Generating aggregate report for task {scan_task_id}")
-        aggregate_report_path = generate_aggregate_report(case_id, scan_task_id)
+        aggregate_report_path = await asyncio.to_thread(
+            generate_aggregate_report, case_id, scan_task_id
+        )
 
-        # Update scan task as completed
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            UPDATE scan_tasks 
-            SET status = 'completed', completed_at = ?, pdf_report_path = ?
-            WHERE id = ?
-        """,
+        # Mark the task completed and store its detection total in one statement
+        async with db.execute(
+            _COMPLETE_SCAN_TASK_SQL,
             (
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 aggregate_report_path,
                 scan_task_id,
             ),
-        )
-        conn.commit()
-        conn.close()
-
-        # Get total detections
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT SUM(detections_found) as total_detections
-            FROM cctv_scan_results WHERE scan_task_id = ?
-        """,
-            (scan_task_id,),
-        )
-        stats = dict(cursor.fetchone())
-        total_detections = stats.get("total_detections", 0) or 0
-        conn.close()
+        ) as cursor:
+            total_detections = (await cursor.fetchone())["total_detections"]
+        await db.commit()
 
         # Notify dashboard that scan completed
         notify_scan_complete(case_id, scan_task_id, total_detections)
 
         # Send email notification
         print(f"[INFO] Sending scan complete notification for case {case_id}")
-        send_scan_complete_notification(case_id, scan_task_id, aggregate_report_path)
+        await asyncio.to_thread(
+            send_scan_complete_notification, case_id, scan_task_id, aggregate_report_path
+        )
 
         print(f"[SUCCESS] Background scan completed for task {scan_task_id}")
 
@@ -163,22 +244,134 @@ def _run_background_scan(scan_task_id, case_id, cctv_list, target_image_path):
 
         # Update status to failed
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute(
+            if db is None:
+                db = await aiosqlite.connect(DB_PATH)
+            await db.rollback()
+            await db.execute(
                 """
                 UPDATE scan_tasks SET status = 'failed', completed_at = ?
                 WHERE id = ?
             """,
                 (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), scan_task_id),
             )
-            conn.commit()
-            conn.close()
+            await db.commit()
         except Exception as db_error:
             print(f"[ERROR] Failed to update scan task status: {db_error}")
 
+    finally:
+        if db is not None:
+            await db.close()
+
 
-def scan_single_cctv(scan_task_id, case_id, cctv_data, target_image_path):
+def _generate_cctv_reports(pending_reports):
+    """
+    Generate per-CCTV PDF reports in parallel worker processes.
+    ReportLab layout is CPU-bound Python, so threads would serialize on the GIL.
+
+    Args:
+        pending_reports: List of (case_id, cctv_id, scan_result) tuples
+
+    Returns:
+        List of report paths (None for failed reports), in input order
+    """
+    if not pending_reports:
+        return []
+
+    processes = min(len(pending_reports), os.cpu_count() or 1)
+    if processes > 1:
+        try:
+            # spawn: forking a process that is running scan/notification threads is unsafe
+            with multiprocessing.get_context("spawn").Pool(processes=processes) as pool:
+                return pool.starmap(generate_cctv_scan_report, pending_reports)
+        except Exception as e:
+            print(f"[WARNING] Parallel report generation failed: {e}. Generating serially.")
+
+    return [generate_cctv_scan_report(*args) for args in pending_reports]
+
+
+async def _flush_scan_results(
+    db, scan_task_id, pending_results, scanned_count, insert_results=True
+):
+    """
+    Update progress and (optionally) insert buffered scan results in one transaction.
+
+    Args:
+        db: Open aiosqlite connection
+        scan_task_id: Scan task ID
+        pending_results: List of cctv_scan_results rows (emptied when inserted)
+        scanned_count: Number of CCTVs scanned so far
+        insert_results: Insert the buffered rows now; otherwise they stay
+            buffered and only the progress count is written
+    """
+    rows = []
+    if insert_results:
+        rows = pending_results[:]
+        pending_results.clear()
+    try:
+        if rows:
+            await db.executemany(_INSERT_SCAN_RESULT_SQL, rows)
+        await db.execute(_UPDATE_PROGRESS_SQL, (scanned_count, scan_task_id))
+        await db.commit()
+        print(f"[INFO] Updated scan progress: {scanned_count} CCTVs scanned")
+    except Exception:
+        await db.rollback()
+        raise
+
+
+async def scan_single_cctv_async(
+    scan_task_id, case_id, cctv_data, target_image_path, pending_results=None
+):
+    """
+    Async variant of scan_single_cctv.
+    The video decode and inference run in a worker thread so the scan
+    event loop stays free for other CCTVs and scans.
+    """
+    return await asyncio.to_thread(
+        scan_single_cctv,
+        scan_task_id,
+        case_id,
+        cctv_data,
+        target_image_path,
+        pending_results,
+    )
+
+
+# Process-wide cap on concurrent surveillance runs (video decode + YOLO/DeepFace).
+# Shared by every scan task, so parallel cases can't oversubscribe the GPU.
+# Each extra concurrent run holds its own YOLO model; raise it only with the
+# memory (and GPU) to spare.
+MAX_CONCURRENT_SCANS = max(1, int(os.getenv("MAX_CONCURRENT_SCANS", "1")))
+_surveillance_slots = threading.BoundedSemaphore(MAX_CONCURRENT_SCANS)
+
+# Matched frames shown in a CCTV report, and the size they are shrunk to
+REPORT_MATCH_IMAGES = 3
+MATCH_THUMBNAIL_SIZE = (400, 300)
+
+
+def _add_match_thumbnails(matches):
+    """
+    Write a downscaled JPEG next to each matched frame the report will show
+    and record it as match["thumb_path"], so the PDF embeds a small image
+    instead of decoding and embedding the full-resolution frame.
+    """
+    for match in matches[:REPORT_MATCH_IMAGES]:
+        image_path = match.get("image_path")
+        if not image_path or not os.path.exists(image_path):
+            continue
+
+        thumb_path = f"{os.path.splitext(image_path)[0]}_thumb.jpg"
+        try:
+            with Image.open(image_path) as im:
+                im.thumbnail(MATCH_THUMBNAIL_SIZE, Image.LANCZOS)
+                im.convert("RGB").save(thumb_path, "JPEG", quality=85, optimize=True)
+            match["thumb_path"] = thumb_path
+        except Exception as e:
+            print(f"[WARNING] Could not create thumbnail for {image_path}: {e}")
+
+
+def scan_single_cctv(
+    scan_task_id, case_id, cctv_data, target_image_path, pending_results=None
+):
     """
     Scan a single CCTV video for target person.
 
@@ -187,6 +380,10 @@ def scan_single_cctv(scan_task_id, case_id, cctv_data, target_image_path):
         case_id: Case ID
         cctv_data: CCTV location data
         target_image_path: Path to target person image
+        pending_results: Optional list to append the cctv_scan_results row to
+            instead of writing it to the database immediately. The row is
+            then recorded without a report path and the caller is expected
+            to generate the PDF report.
 
     Returns:
         Scan result dictionary
@@ -206,36 +403,40 @@ def scan_single_cctv(scan_task_id, case_id, cctv_data, target_image_path):
                 "matches": [],
             }
         else:
-            result = surveillance_yolo_deepface(target_image_path, video_path)
+            with _surveillance_slots:
+                # headless: runs on a worker thread, so no HighGUI window and
+                # no shared face-DB row
+                result = surveillance_yolo_deepface(
+                    target_image_path, video_path, headless=True
+                )
 
         end_time = time.time()
         duration = end_time - start_time
 
-        # Generate individual CCTV report
-        report_path = generate_cctv_scan_report(case_id, cctv_data["cctv_id"], result)
+        # Small JPEGs for the report's "Matched Frames" section
+        _add_match_thumbnails(result.get("matches", []))
 
-        # Save scan result to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        # Generate individual CCTV report (deferred when the caller batches)
+        report_path = None
+        if pending_results is None:
+            report_path = generate_cctv_scan_report(
+                case_id, cctv_data["cctv_id"], result
+            )
 
-        cursor.execute(
-            """
-            INSERT INTO cctv_scan_results 
-            (scan_task_id, cctv_id, video_path, detections_found, scan_duration_seconds, report_path)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """,
-            (
-                scan_task_id,
-                cctv_data["cctv_id"],
-                video_path,
-                result.get("matches_found", 0),
-                duration,
-                report_path,
-            ),
+        # Save scan result to database
+        row = (
+            scan_task_id,
+            cctv_data["cctv_id"],
+            video_path,
+            result.get("matches_found", 0),
+            duration,
+            report_path,
         )
-
-        conn.commit()
-        conn.close()
+        if pending_results is not None:
+            pending_results.append(row)
+        else:
+            with db_connection() as conn, conn:
+                conn.execute(_INSERT_SCAN_RESULT_SQL, row)
 
         # If matches found, send notification
         if result.get("matches_found", 0) > 0:
@@ -243,13 +444,13 @@ def scan_single_cctv(scan_task_id, case_id, cctv_data, target_image_path):
                 f"[MATCH] Found {result['matches_found']} match(es) in {cctv_data['name']}"
             )
 
-            # Notify dashboard in real-time
-            notify_match_found_realtime(
+            # Notify dashboard in real-time (pushed from the broadcast worker)
+            notify_match_found_realtime_background(
                 case_id, cctv_data["cctv_id"], result["matches"][0]
             )
 
-            # Notify about match
-            notify_match_found(
+            # Notify about match (blockchain report + email run in background)
+            notify_match_found_background(
                 case_id,
                 {
                     "frame": result["matches"][0]["frame"],
@@ -266,27 +467,22 @@ def scan_single_cctv(scan_task_id, case_id, cctv_data, target_image_path):
         return {"success": False, "error": str(e), "matches": []}
 
 
-def update_scan_progress(scan_task_id, scanned_count):
+def update_scan_progress(scan_task_id, scanned_count, conn=None):
     """
     Update scan progress in database.
 
     Args:
         scan_task_id: Scan task ID
         scanned_count: Number of CCTVs scanned so far
+        conn: Optional open connection; the caller is then responsible
+            for committing
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """
-            UPDATE scan_tasks SET scanned_cctvs = ? WHERE id = ?
-        """,
-            (scanned_count, scan_task_id),
-        )
-
-        conn.commit()
-        conn.close()
+        if conn is not None:
+            conn.execute(_UPDATE_PROGRESS_SQL, (scanned_count, scan_task_id))
+        else:
+            with db_connection() as own_conn, own_conn:
+                own_conn.execute(_UPDATE_PROGRESS_SQL, (scanned_count, scan_task_id))
 
         print(f"[INFO] Updated scan progress: {scanned_count} CCTVs scanned")
 
@@ -305,33 +501,19 @@ def get_scan_status(scan_task_id):
         Dictionary with scan status information
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM scan_tasks WHERE id = ?", (scan_task_id,))
-        task = cursor.fetchone()
-
-        if not task:
-            return None
-
-        task_dict = dict(task)
+        with db_connection() as conn:
+            cursor = conn.cursor()
 
-        # Get scan results
-        cursor.execute(
-            """
-            SELECT COUNT(*) as total, SUM(detections_found) as total_detections
-            FROM cctv_scan_results WHERE scan_task_id = ?
-        """,
-            (scan_task_id,),
-        )
+            cursor.execute(_SCAN_STATUS_SQL, (scan_task_id,))
+            task = cursor.fetchone()
 
-        stats = dict(cursor.fetchone())
+            if not task:
+                return None
 
-        conn.close()
+            task_dict = dict(task)
 
         return {
             **task_dict,
-            "total_detections": stats.get("total_detections", 0) or 0,
             "progress_percent": (
                 (task_dict["scanned_cctvs"] / task_dict["total_cctvs"] * 100)
                 if task_dict["total_cctvs"] > 0
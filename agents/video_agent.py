@@ -1,8 +1,4 @@
-import sys
-import os
 import sqlite3
-# Add parent directory to path to import surveillance
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     from surveillance import surveillance_yolo_deepface
@@ -29,9 +29,10 @@ def main():
     - Route Prediction: Geohashing + Random Walk Model
     """)
     
-    # Initialize DB on app start if not exists
+    # Initialize DB on app start if not exists (init_db only does work once
+    # per process, however many sessions call it)
+    init_db()
     if 'db_initialized' not in st.session_state:
-        init_db()
         st.session_state['db_initialized'] = True
         st.success("Database connection established.")
 
@@ -2,11 +2,10 @@
 Bhopal/Sehore Region CCTV Locations Configuration
 10 fixed locations with coordinates, geohashes, and video paths
 """
+import math
 import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from utils.geohash_utils import encode_location
+from collections import namedtuple
+import numpy as np
 
 # Bhopal/Sehore district boundaries (approximate)
 REGION_BOUNDS = {
@@ -16,13 +15,19 @@ REGION_BOUNDS = {
     "max_lon": 77.7
 }
 
+# Bounds unpacked once for the per-call region check
+_MIN_LAT, _MAX_LAT = REGION_BOUNDS["min_lat"], REGION_BOUNDS["max_lat"]
+_MIN_LON, _MAX_LON = REGION_BOUNDS["min_lon"], REGION_BOUNDS["max_lon"]
+
 # 10 Fixed CCTV Locations in Bhopal/Sehore
+# geohash is precision 8, precomputed from lat/lon with encode_location
 CCTV_LOCATIONS = [
     {
         "id": 1,
         "name": "Bhopal Junction Railway Station",
         "lat": 23.2699,
         "lon": 77.4026,
+        "geohash": "tsph3k4u",
         "type": "railway_station",
         "video_path": "cctv_footage/bhopal_junction.mp4",
         "description": "Main railway station, high foot traffic"
@@ -32,6 +37,7 @@ CCTV_LOCATIONS = [
         "name": "Sehore Bus Stand",
         "lat": 23.2020,
         "lon": 77.0847,
+        "geohash": "tsngfpg3",
         "type": "bus_stand",
         "video_path": "cctv_footage/sehore_busstand.mp4",
         "description": "Central bus terminal in Sehore"
@@ -41,6 +47,7 @@ CCTV_LOCATIONS = [
         "name": "MP Nagar Zone 1",
         "lat": 23.2327,
         "lon": 77.4278,
+        "geohash": "tsph1vmh",
         "type": "market",
         "video_path": "cctv_footage/mp_nagar.mp4",
         "description": "Major shopping and commercial area"
@@ -50,6 +57,7 @@ CCTV_LOCATIONS = [
         "name": "Habibganj Railway Station",
         "lat": 23.2285,
         "lon": 77.4385,
+        "geohash": "tsph4hsg",
         "type": "railway_station",
         "video_path": "cctv_footage/habibganj_station.mp4",
         "description": "Modern railway station"
@@ -59,6 +67,7 @@ CCTV_LOCATIONS = [
         "name": "New Market Bhopal",
         "lat": 23.2599,
         "lon": 77.4126,
+        "geohash": "tsph3d64",
         "type": "market",
         "video_path": "cctv_footage/new_market.mp4",
         "description": "Traditional market area"
@@ -68,6 +77,7 @@ CCTV_LOCATIONS = [
         "name": "BRTS Corridor - Roshanpura",
         "lat": 23.2156,
         "lon": 77.4304,
+        "geohash": "tsph1fr0",
         "type": "transit",
         "video_path": "cctv_footage/brts_roshanpura.mp4",
         "description": "Bus Rapid Transit System stop"
@@ -77,6 +87,7 @@ CCTV_LOCATIONS = [
         "name": "Sehore Railway Station",
         "lat": 23.2000,
         "lon": 77.0833,
+        "geohash": "tsngfp6m",
         "type": "railway_station",
         "video_path": "cctv_footage/sehore_station.mp4",
         "description": "Sehore railway station"
@@ -86,6 +97,7 @@ CCTV_LOCATIONS = [
         "name": "DB Mall Bhopal",
         "lat": 23.2420,
         "lon": 77.4347,
+        "geohash": "tsph4p44",
         "type": "mall",
         "video_path": "cctv_footage/db_mall.mp4",
         "description": "Popular shopping mall"
@@ -95,6 +107,7 @@ CCTV_LOCATIONS = [
         "name": "Bhopal ISBT (Bus Stand)",
         "lat": 23.2543,
         "lon": 77.4071,
+        "geohash": "tsph33q4",
         "type": "bus_stand",
         "video_path": "cctv_footage/bhopal_isbt.mp4",
         "description": "Inter-State Bus Terminal"
@@ -104,20 +117,89 @@ CCTV_LOCATIONS = [
         "name": "Ashoka Garden Market",
         "lat": 23.2156,
         "lon": 77.4481,
+        "geohash": "tsph467b",
         "type": "market",
         "video_path": "cctv_footage/ashoka_garden.mp4",
         "description": "Local market and residential area"
     }
 ]
 
-# Add geohash to each location
-for loc in CCTV_LOCATIONS:
-    loc["geohash"] = encode_location(loc["lat"], loc["lon"], precision=8)
+# CCTV lookup by ID
+CCTV_BY_ID = {loc["id"]: loc for loc in CCTV_LOCATIONS}
+
+# CCTV names in list order (location pickers)
+CCTV_LOCATION_NAMES = [loc["name"] for loc in CCTV_LOCATIONS]
+
+# CCTV coordinates as parallel arrays (radians) so distance queries run
+# as one vectorized haversine over every location
+EARTH_RADIUS_M = 6371000
+_CCTV_LAT_RAD = np.radians(np.array([loc["lat"] for loc in CCTV_LOCATIONS], dtype=np.float64))
+_CCTV_LON_RAD = np.radians(np.array([loc["lon"] for loc in CCTV_LOCATIONS], dtype=np.float64))
+_CCTV_COS_LAT = np.cos(_CCTV_LAT_RAD)
+
+# Spatial index for nearest-CCTV queries on larger networks.
+# Below KDTREE_MIN_LOCATIONS the linear scan is faster than a tree query.
+KDTREE_MIN_LOCATIONS = 32
+
+def _latlon_to_unit_xyz(lats, lons):
+    """Project lat/lon (degrees) onto the unit sphere as (N, 3) Cartesian points."""
+    phi = np.radians(np.asarray(lats, dtype=np.float64))
+    lam = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+_CCTV_TREE = None
+if len(CCTV_LOCATIONS) >= KDTREE_MIN_LOCATIONS:
+    try:
+        from scipy.spatial import cKDTree
+        _CCTV_TREE = cKDTree(_latlon_to_unit_xyz(
+            [loc["lat"] for loc in CCTV_LOCATIONS],
+            [loc["lon"] for loc in CCTV_LOCATIONS]
+        ))
+    except ImportError:
+        print("[INFO] scipy not installed. Using linear nearest-CCTV search.")
+
+# Geohash buckets for radius queries on the same larger networks: a query
+# only measures CCTVs in its own and the 8 surrounding precision-4 cells.
+# A precision-4 cell is 180/2**10 degrees tall and twice that wide, so the
+# 3x3 block covers any radius up to roughly one cell height (~19 km).
+GEOHASH_BUCKET_PRECISION = 4
+_BUCKET_CELL_HEIGHT_M = EARTH_RADIUS_M * math.radians(180.0 / (1 << 10))
+
+def _build_geohash_buckets():
+    """Map each precision-4 geohash prefix to the indices of its CCTVs."""
+    buckets = {}
+    for i, loc in enumerate(CCTV_LOCATIONS):
+        buckets.setdefault(loc["geohash"][:GEOHASH_BUCKET_PRECISION], []).append(i)
+    return {prefix: np.array(indices) for prefix, indices in buckets.items()}
+
+def _bucket_reach_m(lat):
+    """Radius (meters) a point's 3x3 block of bucket cells is guaranteed to cover."""
+    # Cells narrow towards the poles; keep a 10% margin for great-circle paths
+    return 0.9 * _BUCKET_CELL_HEIGHT_M * min(1.0, 2 * math.cos(math.radians(lat)))
+
+_CCTV_BUCKETS = None
+if len(CCTV_LOCATIONS) >= KDTREE_MIN_LOCATIONS:
+    from utils.geohash_utils import encode_batch, get_neighbors
+    _CCTV_BUCKETS = _build_geohash_buckets()
+
+def _bucket_candidates(lat, lon):
+    """Sorted indices of the CCTVs in the cells around (lat, lon)."""
+    center = encode_batch([lat], [lon], precision=GEOHASH_BUCKET_PRECISION)[0]
+    cells = [center, *get_neighbors(center).values()]
+    found = [_CCTV_BUCKETS[cell] for cell in cells if cell in _CCTV_BUCKETS]
+    if not found:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(found))
+
+# Coordinates for a named location; idx is its position in CCTV_LOCATIONS
+# (and in the _CCTV_* arrays)
+LocCoord = namedtuple("LocCoord", "lat lon geohash idx")
 
 # Location name to coordinates mapping
 LOCATION_NAME_MAP = {
-    loc["name"].lower(): {"lat": loc["lat"], "lon": loc["lon"], "geohash": loc["geohash"]}
-    for loc in CCTV_LOCATIONS
+    sys.intern(loc["name"].lower()): LocCoord(loc["lat"], loc["lon"], loc["geohash"], i)
+    for i, loc in enumerate(CCTV_LOCATIONS)
 }
 
 # Common aliases for locations
@@ -137,54 +219,97 @@ LOCATION_ALIASES = {
     "bus stand": "bhopal isbt (bus stand)",
     "ashoka garden": "ashoka garden market"
 }
+# Interned so alias and name keys share one string object per name
+LOCATION_ALIASES = {sys.intern(k): sys.intern(v) for k, v in LOCATION_ALIASES.items()}
 
 def is_location_in_region(lat, lon):
     """Check if coordinates are within Bhopal/Sehore district."""
-    return (REGION_BOUNDS["min_lat"] <= lat <= REGION_BOUNDS["max_lat"] and
-            REGION_BOUNDS["min_lon"] <= lon <= REGION_BOUNDS["max_lon"])
+    return _MIN_LAT <= lat <= _MAX_LAT and _MIN_LON <= lon <= _MAX_LON
 
-def get_location_by_name(name):
-    """Get location details by name (case-insensitive, supports aliases)."""
-    name_lower = name.lower().strip()
-    
-    # Check aliases first
-    if name_lower in LOCATION_ALIASES:
-        name_lower = LOCATION_ALIASES[name_lower]
-    
-    # Check exact match
+def _match_location_name(name_lower):
+    """Exact, then partial (substring either way) match against LOCATION_NAME_MAP."""
     if name_lower in LOCATION_NAME_MAP:
         return LOCATION_NAME_MAP[name_lower]
     
-    # Check partial match
     for loc_name, coords in LOCATION_NAME_MAP.items():
         if name_lower in loc_name or loc_name in name_lower:
             return coords
     
     return None
 
-def get_nearest_cctv_location(lat, lon):
-    """Find the nearest CCTV location to given coordinates."""
-    from utils.route_utils import haversine_distance
-    
-    min_distance = float('inf')
-    nearest_loc = None
+# Every alias and every substring of a location name, resolved once at import
+# so most lookups are a single dict hit
+_LOCATION_LOOKUP = {}
+for _loc_name in LOCATION_NAME_MAP:
+    for _start in range(len(_loc_name)):
+        for _end in range(_start + 1, len(_loc_name) + 1):
+            _part = sys.intern(_loc_name[_start:_end])
+            if _part not in _LOCATION_LOOKUP:
+                _LOCATION_LOOKUP[_part] = _match_location_name(_part)
+_LOCATION_LOOKUP.update(
+    (alias, LOCATION_NAME_MAP[canonical]) for alias, canonical in LOCATION_ALIASES.items()
+)
+
+def get_location_by_name(name):
+    """
+    Get location details by name (case-insensitive, supports aliases).
+
+    Returns:
+        LocCoord(lat, lon, geohash, idx) or None if the name is unknown
+    """
+    name_lower = name.lower().strip()
     
-    for loc in CCTV_LOCATIONS:
-        dist = haversine_distance(lat, lon, loc["lat"], loc["lon"])
-        if dist < min_distance:
-            min_distance = dist
-            nearest_loc = loc
+    if name_lower in _LOCATION_LOOKUP:
+        return _LOCATION_LOOKUP[name_lower]
     
-    return nearest_loc, min_distance
+    # Text that contains a location name, e.g. "near new market bhopal gate"
+    return _match_location_name(name_lower)
+
+def _haversine_terms(lat, lon, indices=slice(None)):
+    """Haversine 'a' term from (lat, lon) to the CCTV locations (all by default)."""
+    phi1 = math.radians(lat)
+    lambda1 = math.radians(lon)
+    return (np.sin((_CCTV_LAT_RAD[indices] - phi1) / 2) ** 2 +
+            math.cos(phi1) * _CCTV_COS_LAT[indices] *
+            np.sin((_CCTV_LON_RAD[indices] - lambda1) / 2) ** 2)
+
+def _haversine_meters(a):
+    """Convert haversine 'a' term(s) to great-circle distance in meters."""
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+def get_nearest_cctv_location(lat, lon):
+    """Find the nearest CCTV location to given coordinates."""
+    if _CCTV_TREE is not None:
+        chord, idx = _CCTV_TREE.query(_latlon_to_unit_xyz([lat], [lon])[0], k=1)
+        # Chord length on the unit sphere -> great-circle distance in meters
+        distance = 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+        return CCTV_LOCATIONS[int(idx)], distance
+
+    if not CCTV_LOCATIONS:
+        return None, float('inf')
+
+    # The haversine term is monotonic in distance, so compare it directly
+    # and only convert the winner to meters
+    a = _haversine_terms(lat, lon)
+    nearest = int(np.argmin(a))
+    return CCTV_LOCATIONS[nearest], float(_haversine_meters(a[nearest]))
 
 def get_cctv_locations_in_radius(lat, lon, radius_meters=5000):
     """Get all CCTV locations within radius of given point."""
-    from utils.route_utils import haversine_distance
-    
-    locations = []
-    for loc in CCTV_LOCATIONS:
-        dist = haversine_distance(lat, lon, loc["lat"], loc["lon"])
-        if dist <= radius_meters:
-            locations.append({**loc, "distance": dist})
-    
-    return sorted(locations, key=lambda x: x["distance"])
+    if not CCTV_LOCATIONS:
+        return []
+
+    # On bucketed networks only measure CCTVs in the nearby geohash cells
+    if _CCTV_BUCKETS is not None and radius_meters <= _bucket_reach_m(lat):
+        candidates = _bucket_candidates(lat, lon)
+    else:
+        candidates = np.arange(len(CCTV_LOCATIONS))
+
+    distances = _haversine_meters(_haversine_terms(lat, lon, candidates))
+    in_radius = np.flatnonzero(distances <= radius_meters)
+    in_radius = in_radius[np.argsort(distances[in_radius], kind="stable")]
+
+    return [
+        {**CCTV_LOCATIONS[candidates[i]], "distance": float(distances[i])}
+        for i in in_radius
+    ]
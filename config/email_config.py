@@ -2,12 +2,14 @@
 Email Configuration for Gmail SMTP Notifications
 """
 import os
+from string import Formatter
 from dotenv import load_dotenv
 load_dotenv()    
 
 # Gmail SMTP Configuration
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
+MAX_SMTP_SESSIONS = 2  # concurrent SMTP connections allowed
 
 # Email credentials (to be set by user)
 # For security, use environment variables or config file
@@ -93,6 +95,34 @@ Missing Person Detection System
 Bhopal/Sehore District
 """
 
+def _compile_template(template):
+    """
+    Split a str.format template with plain {name} placeholders into
+    (literal, field, format_spec) parts, so it is only parsed once.
+    """
+    return tuple(
+        (literal, field, spec or "")
+        for literal, field, spec, _ in Formatter().parse(template)
+    )
+
+def _render_template(parts, fields):
+    """Fill a compiled template from a dict of field values."""
+    return "".join([
+        literal if field is None else literal + format(fields[field], spec)
+        for literal, field, spec in parts
+    ])
+
+_MATCH_FOUND_PARTS = _compile_template(MATCH_FOUND_BODY)
+_CASE_FILED_PARTS = _compile_template(CASE_FILED_BODY)
+
+def render_match_body(fields):
+    """Render MATCH_FOUND_BODY (same output as MATCH_FOUND_BODY.format(**fields))."""
+    return _render_template(_MATCH_FOUND_PARTS, fields)
+
+def render_case_filed_body(fields):
+    """Render CASE_FILED_BODY (same output as CASE_FILED_BODY.format(**fields))."""
+    return _render_template(_CASE_FILED_PARTS, fields)
+
 def get_email_config():
     """Get email configuration (can be overridden by environment variables)."""
     import os
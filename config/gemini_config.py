@@ -20,6 +20,15 @@ REQUEST_TIMEOUT = 30
 
 # Rate Limiting
 MAX_REQUESTS_PER_MINUTE = 60
+MAX_CONCURRENT_REQUESTS = 8
+
+# Request Batching (concurrent prompts are coalesced into one Gemini call)
+BATCH_MAX_SIZE = 16
+BATCH_MAX_WAIT_MS = 20
+
+# NLP Result Cache (keyed by a hash of the complaint text)
+NLP_CACHE_MAXSIZE = 4096
+NLP_CACHE_DIR = os.getenv("NLP_CACHE_DIR", ".nlp_cache")
 
 # Prompt Templates for NLP Tasks
 METADATA_EXTRACTION_PROMPT = """
@@ -75,6 +84,15 @@ If no location found, return: {{"name": "", "found": false}}
 Return ONLY valid JSON.
 """
 
+BATCH_PROMPT_HEADER = """
+You will receive {count} independent tasks. Answer each task separately, exactly as
+its own instructions ask. Start every answer with its marker line, e.g. <<<RESPONSE 1>>>,
+and write nothing outside the marked answers.
+"""
+
+BATCH_TASK_MARKER = "<<<TASK {index}>>>"
+BATCH_RESPONSE_MARKER = "<<<RESPONSE {index}>>>"
+
 AUDIO_TRANSCRIPTION_PROMPT = """
 Transcribe the following audio content accurately.
 Focus on clarity and include all spoken words.
@@ -1,174 +1,289 @@
 import sqlite3
 import os
+import queue
+import atexit
+import functools
 import numpy as np
 import io
+import struct
+from contextlib import contextmanager
 
 DB_PATH = "missing_persons.db"
+DB_POOL_SIZE = 8  # idle connections kept open for reuse
+
+# Arrays (face embeddings) are stored int8-quantized with one float32 scale
+# per array behind a small shape header:
+#   <ndim | _INT8_FLAG:uint8><dim:uint32 * ndim><scale:float32><int8 data>
+# Cosine similarity is unaffected well below the match threshold, at a
+# quarter of the float32 size. Blobs without the flag hold raw float32 data
+# (<ndim:uint8><dim:uint32 * ndim><float32 data>).
+_ARRAY_DTYPE = np.dtype("<f4")
+_INT8_FLAG = 0x80
+_NPY_MAGIC = b"\x93NUMPY"
 
 def adapt_array(arr):
-    """
-    http://stackoverflow.com/a/31312102/190597 (SoulNibbler)
-    """
-    out = io.BytesIO()
-    np.save(out, arr)
-    out.seek(0)
-    return sqlite3.Binary(out.read())
+    """Serialize an array as a shape header, a scale and int8-quantized values."""
+    arr = np.asarray(arr, dtype=_ARRAY_DTYPE)
+    peak = float(np.abs(arr).max()) if arr.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    quantized = np.rint(arr / scale).astype(np.int8)
+    header = struct.pack(f"<B{arr.ndim}If", arr.ndim | _INT8_FLAG, *arr.shape, scale)
+    return sqlite3.Binary(header + quantized.tobytes())
 
 def convert_array(text):
-    out = io.BytesIO(text)
-    out.seek(0)
-    return np.load(out)
+    """
+    Deserialize an array written by adapt_array as float32.
+    Raw float32 blobs (returned as a read-only view) and blobs saved in the
+    older np.save format are still loaded.
+    """
+    if text[:len(_NPY_MAGIC)] == _NPY_MAGIC:
+        return np.load(io.BytesIO(text))
+    ndim = text[0] & ~_INT8_FLAG
+    shape = struct.unpack_from(f"<{ndim}I", text, 1)
+    offset = 1 + 4 * ndim
+    if not text[0] & _INT8_FLAG:
+        return np.frombuffer(text, dtype=_ARRAY_DTYPE, offset=offset).reshape(shape)
+    (scale,) = struct.unpack_from("<f", text, offset)
+    quantized = np.frombuffer(text, dtype=np.int8, offset=offset + 4)
+    return (quantized.astype(_ARRAY_DTYPE) * _ARRAY_DTYPE.type(scale)).reshape(shape)
 
 # Register numpy array adapter
 sqlite3.register_adapter(np.ndarray, adapt_array)
 sqlite3.register_converter("array", convert_array)
 
+# blockchain_reports.blockchain_hash is UNIQUE, so it is indexed already
+_SCHEMA_DDL = """
+-- Table: missing_cases
+CREATE TABLE IF NOT EXISTS missing_cases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    age INTEGER,
+    description TEXT,
+    last_seen_geohash TEXT,
+    last_seen_location TEXT,
+    time_lost TIMESTAMP,
+    date_reported TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    embedding array,
+    transcript TEXT,
+    emotion TEXT,
+    image_path TEXT,
+    email TEXT,
+    status TEXT DEFAULT 'Active'
+);
+
+-- Table: videos_scanned
+CREATE TABLE IF NOT EXISTS videos_scanned (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER,
+    video_name TEXT,
+    video_path TEXT,
+    cctv_location_id INTEGER,
+    matches_found INTEGER DEFAULT 0,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(case_id) REFERENCES missing_cases(id)
+);
+
+-- Table: match_logs
+CREATE TABLE IF NOT EXISTS match_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER,
+    frame_number INTEGER,
+    score REAL,
+    saved_img_path TEXT,
+    cctv_location_id INTEGER,
+    geohash TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(case_id) REFERENCES missing_cases(id)
+);
+
+-- Table: geohash_predictions (for route prediction caching/logging)
+CREATE TABLE IF NOT EXISTS geohash_predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER,
+    start_geohash TEXT,
+    predicted_path TEXT,
+    cctv_videos TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(case_id) REFERENCES missing_cases(id)
+);
+
+-- Table: blockchain_reports
+CREATE TABLE IF NOT EXISTS blockchain_reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER,
+    report_data TEXT,
+    blockchain_hash TEXT UNIQUE,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(case_id) REFERENCES missing_cases(id)
+);
+
+-- Table: cctv_locations (for reference)
+CREATE TABLE IF NOT EXISTS cctv_locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    lat REAL,
+    lon REAL,
+    geohash TEXT,
+    type TEXT,
+    video_path TEXT,
+    description TEXT
+);
+
+-- Table: scan_tasks (for background CCTV scanning)
+CREATE TABLE IF NOT EXISTS scan_tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_id INTEGER,
+    status TEXT DEFAULT 'pending',
+    total_cctvs INTEGER,
+    scanned_cctvs INTEGER DEFAULT 0,
+    started_at TIMESTAMP,
+    completed_at TIMESTAMP,
+    pdf_report_path TEXT,
+    total_detections INTEGER,
+    FOREIGN KEY(case_id) REFERENCES missing_cases(id)
+);
+
+-- Table: cctv_scan_results (detailed scan results per CCTV)
+CREATE TABLE IF NOT EXISTS cctv_scan_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scan_task_id INTEGER,
+    cctv_id INTEGER,
+    video_path TEXT,
+    detections_found INTEGER DEFAULT 0,
+    scan_duration_seconds REAL,
+    report_path TEXT,
+    scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(scan_task_id) REFERENCES scan_tasks(id),
+    FOREIGN KEY(cctv_id) REFERENCES cctv_locations(id)
+);
+
+-- Indexes for the per-case / per-task lookups the dashboard and scans run
+CREATE INDEX IF NOT EXISTS idx_match_logs_case ON match_logs(case_id);
+CREATE INDEX IF NOT EXISTS idx_videos_scanned_case ON videos_scanned(case_id);
+CREATE INDEX IF NOT EXISTS idx_csr_scan_task ON cctv_scan_results(scan_task_id);
+CREATE INDEX IF NOT EXISTS idx_csr_cctv ON cctv_scan_results(cctv_id);
+CREATE INDEX IF NOT EXISTS idx_geohash_predictions_case ON geohash_predictions(case_id);
+CREATE INDEX IF NOT EXISTS idx_scan_tasks_case ON scan_tasks(case_id);
+CREATE INDEX IF NOT EXISTS idx_blockchain_reports_case ON blockchain_reports(case_id);
+CREATE INDEX IF NOT EXISTS idx_missing_cases_status ON missing_cases(status);
+
+-- 5-character geohash prefix (~4.9 km cell) for area lookups; query with
+-- WHERE substr(geohash, 1, 5) = ? so SQLite can use the expression index
+CREATE INDEX IF NOT EXISTS idx_match_logs_geohash_p5 ON match_logs(substr(geohash, 1, 5));
+CREATE INDEX IF NOT EXISTS idx_missing_cases_geohash_p5 ON missing_cases(substr(last_seen_geohash, 1, 5));
+"""
+
+# Columns added after a table was first shipped: CREATE TABLE IF NOT EXISTS
+# won't add them to an existing database, so init_db adds any that are missing
+_ADDED_COLUMNS = [
+    ("scan_tasks", "total_detections", "INTEGER"),
+]
+
+def _add_missing_columns(c):
+    for table, column, col_type in _ADDED_COLUMNS:
+        existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+
+@functools.lru_cache(maxsize=None)
 def init_db():
-    """Initialize the SQLite database and create tables."""
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+    """Initialize the SQLite database and create tables (once per process)."""
+    # Autocommit mode so the schema and seed below run in one explicit transaction
+    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-64000")
     c = conn.cursor()
+    # Whole schema in one script; the transaction stays open for the seed below
+    c.executescript("BEGIN IMMEDIATE;" + _SCHEMA_DDL)
+    _add_missing_columns(c)
 
-    # Table: missing_cases
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS missing_cases (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            age INTEGER,
-            description TEXT,
-            last_seen_geohash TEXT,
-            last_seen_location TEXT,
-            time_lost TIMESTAMP,
-            date_reported TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            embedding array,
-            transcript TEXT,
-            emotion TEXT,
-            image_path TEXT,
-            email TEXT,
-            status TEXT DEFAULT 'Active'
-        )
-    ''')
-
-    # Table: videos_scanned
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS videos_scanned (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            case_id INTEGER,
-            video_name TEXT,
-            video_path TEXT,
-            cctv_location_id INTEGER,
-            matches_found INTEGER DEFAULT 0,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(case_id) REFERENCES missing_cases(id)
-        )
-    ''')
-
-    # Table: match_logs
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS match_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            case_id INTEGER,
-            frame_number INTEGER,
-            score REAL,
-            saved_img_path TEXT,
-            cctv_location_id INTEGER,
-            geohash TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(case_id) REFERENCES missing_cases(id)
-        )
-    ''')
-    
-    # Table: geohash_predictions (for route prediction caching/logging)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS geohash_predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            case_id INTEGER,
-            start_geohash TEXT,
-            predicted_path TEXT,
-            cctv_videos TEXT,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(case_id) REFERENCES missing_cases(id)
-        )
-    ''')
-    
-    # Table: blockchain_reports
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS blockchain_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            case_id INTEGER,
-            report_data TEXT,
-            blockchain_hash TEXT UNIQUE,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(case_id) REFERENCES missing_cases(id)
-        )
-    ''')
-    
-    # Table: cctv_locations (for reference)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS cctv_locations (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            lat REAL,
-            lon REAL,
-            geohash TEXT,
-            type TEXT,
-            video_path TEXT,
-            description TEXT
-        )
-    ''')
-    
-    # Table: scan_tasks (for background CCTV scanning)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS scan_tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            case_id INTEGER,
-            status TEXT DEFAULT 'pending',
-            total_cctvs INTEGER,
-            scanned_cctvs INTEGER DEFAULT 0,
-            started_at TIMESTAMP,
-            completed_at TIMESTAMP,
-            pdf_report_path TEXT,
-            FOREIGN KEY(case_id) REFERENCES missing_cases(id)
-        )
-    ''')
-    
-    # Table: cctv_scan_results (detailed scan results per CCTV)
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS cctv_scan_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            scan_task_id INTEGER,
-            cctv_id INTEGER,
-            video_path TEXT,
-            detections_found INTEGER DEFAULT 0,
-            scan_duration_seconds REAL,
-            report_path TEXT,
-            scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY(scan_task_id) REFERENCES scan_tasks(id),
-            FOREIGN KEY(cctv_id) REFERENCES cctv_locations(id)
-        )
-    ''')
-
-    conn.commit()
-    
-    # Populate CCTV locations if empty
-    c.execute("SELECT COUNT(*) FROM cctv_locations")
-    if c.fetchone()[0] == 0:
+    # Populate CCTV locations if empty (one batched insert)
+    c.execute("SELECT 1 FROM cctv_locations LIMIT 1")
+    if c.fetchone() is None:
         from config.bhopal_sehore_locations import CCTV_LOCATIONS
-        for loc in CCTV_LOCATIONS:
-            c.execute('''
-                INSERT INTO cctv_locations (id, name, lat, lon, geohash, type, video_path, description)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (loc["id"], loc["name"], loc["lat"], loc["lon"], loc["geohash"], 
-                  loc["type"], loc["video_path"], loc["description"]))
-        conn.commit()
-    
+        c.executemany('''
+            INSERT INTO cctv_locations (id, name, lat, lon, geohash, type, video_path, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(loc["id"], loc["name"], loc["lat"], loc["lon"], loc["geohash"],
+               loc["type"], loc["video_path"], loc["description"]) for loc in CCTV_LOCATIONS])
+
+    c.execute("COMMIT")
     conn.close()
     print(f"Database initialized at {DB_PATH}")
 
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to the pool."""
+
+    _in_pool = False
+
+    def close(self):
+        _release_connection(self)
+
+_POOL = queue.Queue(maxsize=DB_POOL_SIZE)
+
+def _create_connection():
+    conn = sqlite3.connect(
+        DB_PATH,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        check_same_thread=False,  # connections move between worker threads
+        factory=PooledConnection,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-64000")  # ~64 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # memory-map up to 256 MB of the file
+    return conn
+
+def _release_connection(conn):
+    """Return a connection to the pool, discarding any uncommitted work."""
+    if conn._in_pool:
+        return
+    try:
+        conn.rollback()
+        conn.row_factory = sqlite3.Row
+        conn._in_pool = True
+        _POOL.put_nowait(conn)
+    except (sqlite3.Error, queue.Full):
+        conn._in_pool = False
+        sqlite3.Connection.close(conn)
+
 def get_db_connection():
-    """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES)
+    """
+    Get a connection to the SQLite database.
+    Connections are reused from a pool; calling close() returns them to it.
+    """
+    try:
+        conn = _POOL.get_nowait()
+        conn._in_pool = False
+    except queue.Empty:
+        conn = _create_connection()
     conn.row_factory = sqlite3.Row
     return conn
 
+@atexit.register
+def _close_pool():
+    """Really close idle pooled connections when the process exits."""
+    while True:
+        try:
+            conn = _POOL.get_nowait()
+        except queue.Empty:
+            break
+        try:
+            sqlite3.Connection.close(conn)
+        except sqlite3.Error:
+            pass
+
+@contextmanager
+def db_connection():
+    """Context manager that borrows a pooled connection and returns it on exit."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
 if __name__ == "__main__":
     init_db()
@@ -9,7 +9,7 @@ Features:
 - DeepFace (Facenet512) face embeddings & verification
 - OpenGait gait embedding (GaitGL/GaitBase) for gait matching
 - Fusion logic: face match (high confidence) OR gait match (backup) OR weighted score
-- Saves detected person crops, matched frames, and logs to CSV + terminal
+- Saves matched frames (and optionally every detected person crop), logs to CSV + terminal
 - SQLite database for storing target person embeddings (face + gait)
 
 Assumptions & Requirements:
@@ -49,9 +49,12 @@ import cv2
 import time
 import sqlite3
 import csv
+import queue
 import argparse
+import threading
 import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from ultralytics import YOLO
 from deepface import DeepFace
 from deep_sort_realtime.deepsort_tracker import DeepSort
@@ -71,10 +74,24 @@ except Exception:
     # OpenGait not available; continue in face-only mode
     USE_OPENGAIT = False
 
+# GPU inference settings (torch ships with ultralytics)
+try:
+    import torch
+    USE_CUDA = torch.cuda.is_available()
+    if USE_CUDA:
+        torch.backends.cudnn.benchmark = True         # fixed 640px input: let cuDNN pick the fastest kernels
+        torch.backends.cuda.matmul.allow_tf32 = True
+except ImportError:
+    USE_CUDA = False
+GAIT_DEVICE = 'cuda' if USE_CUDA else 'cpu'
+
 # ------------------------
 # Configuration
 # ------------------------
-YOLO_MODEL = "yolov8n.pt"
+# Point at an exported TensorRT engine for best GPU throughput, e.g.
+#   YOLO('yolov8n.pt').export(format='engine', half=True, dynamic=True, batch=8)
+# and then YOLO_MODEL=yolov8n.engine
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolov8n.pt")
 DB_PATH = "combined_face_gait.db"
 OUTPUT_DIR = "combined_output"
 DETECTED_DIR = os.path.join(OUTPUT_DIR, "detected_people")
@@ -86,13 +103,34 @@ FACE_SIM_THRESHOLD = 0.55      # Facenet512 cosine similarity
 GAIT_SIM_THRESHOLD = 0.70      # OpenGait similarity
 WEIGHT_FACE = 0.8
 WEIGHT_GAIT = 0.2
+FACE_EMA_ALPHA = 0.1           # weight of each new face in a track's running face embedding
 
 # gait settings
 SILHOUETTE_MIN_FRAMES = 16     # minimum silhouette frames for reliable gait emb
 TRACK_SIL_BUFFER = 64          # max silhouettes to store per track
+GAIT_SIL_SIZE = (64, 64)       # silhouette size fed to OpenGait (w, h)
+# CPU only: dynamic INT8 quantization of the gait model's Linear layers.
+# Re-check GAIT_SIM_THRESHOLD on known walks before enabling.
+GAIT_QUANTIZE_INT8 = os.getenv("GAIT_QUANTIZE_INT8", "0") == "1"
+
+# output settings
+SAVE_DEBUG_CROPS = False       # write every tracked person crop to DETECTED_DIR (slow, debugging only)
+MATCH_JPEG_QUALITY = 85
+MATCH_WRITER_THREADS = 2       # background threads encoding/writing match frames
+LOG_FLUSH_ROWS = 100           # detection log rows buffered between flushes
+DISPLAY_MAX_WIDTH = 1000       # preview window width cap
 
 # processing settings
 FRAME_SKIP = 1                 # process every frame
+READ_AHEAD_FRAMES = 32         # decoded frames buffered ahead of inference
+# YOLO is skipped on frames whose mean gray-level change (0-255, on a 160x90
+# thumbnail) inside every tracked box - or the whole frame when nothing is
+# tracked - is below MOTION_THRESHOLD. 0 = never skip (default); validate on
+# real footage before enabling.
+MOTION_THRESHOLD = 0.0
+FORCE_FULL_EVERY = 30          # run YOLO at least once every N processed frames
+MOTION_SIZE = (160, 90)
+YOLO_BATCH_SIZE = 8            # frames per YOLO call
 DETECT_CONF = 0.25
 IOU = 0.45
 
@@ -108,6 +146,11 @@ def ensure_dirs():
 
 def init_database(db_path=DB_PATH):
     conn = sqlite3.connect(db_path)
+    # WAL: enrollment commits append to the log instead of fsyncing a rollback journal
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA mmap_size=268435456')
     cur = conn.cursor()
     cur.execute('''
         CREATE TABLE IF NOT EXISTS persons (
@@ -153,13 +196,31 @@ def load_gait_embedding(conn, name):
     return None
 
 
-def append_log(row):
-    write_header = not os.path.exists(LOG_CSV)
-    with open(LOG_CSV, 'a', newline='') as f:
-        writer = csv.writer(f)
-        if write_header:
-            writer.writerow(['timestamp','frame','track_id','bbox','face_sim','gait_sim','fused_score','match','saved_path'])
-        writer.writerow(row)
+def load_person_embeddings(conn, name):
+    """(face_embedding, gait_embedding) for a person in one query; None where missing."""
+    cur = conn.cursor()
+    cur.execute('SELECT face_embedding, gait_embedding FROM persons WHERE name=?', (name,))
+    row = cur.fetchone()
+    if not row:
+        return None, None
+    return tuple(np.frombuffer(blob, dtype=np.float32) if blob else None for blob in row)
+
+
+def open_log():
+    """Open LOG_CSV for appending once per run; writes the header if the file is new/empty."""
+    f = open(LOG_CSV, 'a', newline='', buffering=1 << 16)
+    writer = csv.writer(f)
+    if f.tell() == 0:
+        writer.writerow(['timestamp','frame','track_id','bbox','face_sim','gait_sim','fused_score','match','saved_path'])
+    return f, writer
+
+
+def write_match_frame(path, img):
+    """Encode and write an annotated match frame (runs on the match writer pool)."""
+    try:
+        cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, MATCH_JPEG_QUALITY])[1].tofile(path)
+    except Exception as e:
+        print('[WARN] Could not write match frame', path, e)
 
 # ------------------------
 # Face Embedding utils
@@ -177,6 +238,31 @@ def get_face_embedding_from_image(img_bgr, detector_backend='opencv', enforce=Tr
         return None
     return None
 
+
+# cleared once the installed DeepFace turns out not to take a list of images
+_deepface_batching = True
+
+
+def get_face_embeddings_from_images(imgs_bgr, detector_backend='opencv', enforce=True):
+    """
+    Facenet512 embeddings for several images (None where no face), with one
+    batched DeepFace.represent call where the installed DeepFace supports it.
+    """
+    global _deepface_batching
+    if len(imgs_bgr) > 1 and _deepface_batching:
+        try:
+            reps = DeepFace.represent(img_path=list(imgs_bgr), model_name='Facenet512', detector_backend=detector_backend, enforce_detection=enforce)
+            # batched call returns one list of faces per image
+            if len(reps) == len(imgs_bgr) and all(isinstance(rep, list) for rep in reps):
+                return [np.array(rep[0]['embedding'], dtype=np.float32) if rep else None for rep in reps]
+            _deepface_batching = False
+        except Exception:
+            # with enforce=True a single faceless image fails the whole batch
+            if not enforce:
+                _deepface_batching = False
+    # single image, older DeepFace or a failed batch: one call per image
+    return [get_face_embedding_from_image(img, detector_backend, enforce) for img in imgs_bgr]
+
 # ------------------------
 # OpenGait utils (optional)
 # ------------------------
@@ -191,7 +277,11 @@ def load_opengait_model(model_name='GaitGL'):
     if not os.path.exists(weights_path):
         raise FileNotFoundError(f'OpenGait weights not found at {weights_path}')
     model.load_state_dict(torch.load(weights_path, map_location='cpu'))
+    model.to(GAIT_DEVICE)
     model.eval()
+    if GAIT_QUANTIZE_INT8 and GAIT_DEVICE == 'cpu':
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        print("[INFO] OpenGait model quantized to INT8 (dynamic)")
     return model, cfg
 
 
@@ -199,7 +289,50 @@ def compute_gait_embedding_opengait(model, cfg, silhouette_dir):
     seq = load_silhouettes(silhouette_dir)
     if seq is None:
         return None
-    seq_t = torch.tensor(seq).unsqueeze(0).float()
+    seq_t = torch.tensor(seq).unsqueeze(0).float().to(GAIT_DEVICE)
+    with torch.no_grad():
+        features = model(seq_t)
+        emb = features['embeddings'].cpu().numpy()[0]
+    return emb
+
+
+# (pinned host tensor, device tensor) reused for every track gait evaluation
+_gait_input_buffers = None
+
+
+def _gait_input_tensor(sils_np):
+    """
+    (1, T, H, W) model input on GAIT_DEVICE. On CUDA the fixed-size track
+    sequences are copied through preallocated pinned/device buffers instead
+    of allocating and transferring a fresh tensor per call.
+    """
+    global _gait_input_buffers
+    if GAIT_DEVICE == 'cpu':
+        return torch.from_numpy(sils_np).unsqueeze(0)
+    if sils_np.shape[0] != SILHOUETTE_MIN_FRAMES:
+        # target walk video: one-off, variable length
+        return torch.from_numpy(sils_np).unsqueeze(0).to(GAIT_DEVICE)
+    if _gait_input_buffers is None:
+        host = torch.empty((1, *sils_np.shape), pin_memory=True)
+        _gait_input_buffers = (host, torch.empty_like(host, device=GAIT_DEVICE))
+    host, device_input = _gait_input_buffers
+    host[0].copy_(torch.from_numpy(sils_np))
+    device_input.copy_(host, non_blocking=True)
+    return device_input
+
+
+def compute_gait_embedding_from_array(model, sils):
+    """
+    Gait embedding from in-memory silhouette masks (uint8, 0/255), resized to
+    GAIT_SIL_SIZE and scaled to [0, 1] - no temp PNGs written or read back.
+    An ndarray of shape (T, h, w) is taken to be already at GAIT_SIL_SIZE.
+    """
+    if len(sils) == 0:
+        return None
+    if not isinstance(sils, np.ndarray):
+        sils = np.stack([cv2.resize(s, GAIT_SIL_SIZE) for s in sils])
+    sils_np = sils.astype(np.float32) / 255.0
+    seq_t = _gait_input_tensor(sils_np)
     with torch.no_grad():
         features = model(seq_t)
         emb = features['embeddings'].cpu().numpy()[0]
@@ -218,6 +351,81 @@ def silhouette_from_crop(crop_bgr):
 # Main pipeline
 # ------------------------
 
+def _read_frames(cap, frames, stop_event):
+    """
+    Reader thread: put (frame_idx, frame, diff) for every FRAME_SKIP-th
+    frame on the queue, then None. diff is the absolute difference from the
+    previous queued frame on a MOTION_SIZE grayscale thumbnail (None for the
+    first frame, or when motion gating is off). OpenCV releases the GIL
+    while decoding.
+    """
+    frames_read = 0
+    prev_small = None
+    gate = MOTION_THRESHOLD > 0
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames_read += 1
+            if frames_read % FRAME_SKIP != 0:
+                continue
+            diff = None
+            if gate:
+                small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), MOTION_SIZE, interpolation=cv2.INTER_AREA)
+                if prev_small is not None:
+                    diff = cv2.absdiff(prev_small, small)
+                prev_small = small
+            frames.put((frames_read, frame, diff))
+    finally:
+        frames.put(None)
+
+
+def _box_motion(diff, boxes, frame_w, frame_h):
+    """
+    Largest mean change on the diff thumbnail inside any of the boxes
+    (l, t, r, b in frame pixels); the whole-thumbnail mean when there are none.
+    """
+    if not boxes:
+        return float(diff.mean())
+    sx = MOTION_SIZE[0] / frame_w
+    sy = MOTION_SIZE[1] / frame_h
+    motion = 0.0
+    for l, t, r, b in boxes:
+        x1, y1 = max(0, int(l * sx)), max(0, int(t * sy))
+        x2, y2 = min(MOTION_SIZE[0], int(r * sx) + 1), min(MOTION_SIZE[1], int(b * sy) + 1)
+        if x2 > x1 and y2 > y1:
+            motion = max(motion, float(diff[y1:y2, x1:x2].mean()))
+    return motion
+
+
+def _show_frames(previews, user_quit):
+    """
+    Display thread: resize and show the latest (frame, size) from the
+    previews queue until None arrives; sets user_quit when 'q' is pressed.
+    All highgui calls stay on this thread.
+    """
+    while True:
+        item = previews.get()
+        if item is None:
+            break
+        frame, size = item
+        h, w = frame.shape[:2]
+        cv2.imshow('Combined Surveillance', frame if size == (w, h) else cv2.resize(frame, size))
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            user_quit.set()
+    cv2.destroyAllWindows()
+
+
+def _offer_preview(previews, item):
+    """Replace whatever the display thread has not picked up yet (never blocks)."""
+    try:
+        previews.get_nowait()
+    except queue.Empty:
+        pass
+    previews.put_nowait(item)
+
+
 def combined_pipeline(target_face_path=None, target_walk_video=None, surveillance_video=None, name='target_person'):
     ensure_dirs()
     conn = init_database()
@@ -251,21 +459,18 @@ def combined_pipeline(target_face_path=None, target_walk_video=None, surveillanc
         print('[INFO] OpenGait available — computing target gait embedding...')
         try:
             gait_model, gait_cfg = load_opengait_model('GaitGL')
-            # extract silhouettes to temp folder
-            tmp_target_sil = os.path.join('tmp_target_sil')
-            os.makedirs(tmp_target_sil, exist_ok=True)
+            # extract silhouettes in memory (already shrunk to the gait input size)
+            target_sils = []
             cap = cv2.VideoCapture(target_walk_video)
-            idx = 0
             while True:
                 ret, frame = cap.read()
                 if not ret:
                     break
-                idx += 1
                 gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
                 _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-                cv2.imwrite(os.path.join(tmp_target_sil, f"{idx:04d}.png"), mask)
+                target_sils.append(cv2.resize(mask, GAIT_SIL_SIZE))
             cap.release()
-            target_gait_emb = compute_gait_embedding_opengait(gait_model, gait_cfg, tmp_target_sil)
+            target_gait_emb = compute_gait_embedding_from_array(gait_model, target_sils)
             if target_gait_emb is not None:
                 save_gait_embedding(conn, name, target_gait_emb)
                 print('[OK] Target gait embedding saved to DB')
@@ -278,163 +483,250 @@ def combined_pipeline(target_face_path=None, target_walk_video=None, surveillanc
         if target_walk_video:
             print('[WARN] OpenGait not available; skipping gait creation')
 
-    # reload stored embeddings
-    stored_face_emb = load_face_embedding(conn, name)
-    stored_gait_emb = load_gait_embedding(conn, name)
+    # reload stored embeddings, normalized once for all comparisons
+    stored_face_emb, stored_gait_emb = map(normalize_embedding, load_person_embeddings(conn, name))
 
     # 4) Open surveillance video
     cap = cv2.VideoCapture(surveillance_video)
     if not cap.isOpened():
         raise FileNotFoundError('Surveillance video not found or cannot be opened')
 
-    frame_idx = 0
     found_matches = 0
 
-    # per-track buffers: face embeddings list, silhouettes list (for gait)
+    # per-track state: smoothed face embedding, silhouettes list (for gait)
     tracks_data = {}
 
+    log_file, log_writer = open_log()
+    log_rows = 0
+    # JPEG encode + disk write of match frames overlaps with the next tracks/frames
+    match_writer = ThreadPoolExecutor(max_workers=MATCH_WRITER_THREADS)
+
     print('[INFO] Starting surveillance processing...')
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+    # Decode on a background thread so reading overlaps with inference
+    frames = queue.Queue(maxsize=READ_AHEAD_FRAMES)
+    stop_reader = threading.Event()
+    reader = threading.Thread(target=_read_frames, args=(cap, frames, stop_reader), daemon=True)
+    reader.start()
+
+    # Preview window runs on its own thread; only the newest frame is kept
+    previews = queue.Queue(maxsize=1)
+    user_quit = threading.Event()
+    display = threading.Thread(target=_show_frames, args=(previews, user_quit), daemon=True)
+    display.start()
+
+    stop = False
+    reader_done = False
+    since_full = 0
+    track_boxes = []   # confirmed track boxes after the last tracked frame
+    disp_size = None
+    while not stop and not reader_done:
+        # Take up to YOLO_BATCH_SIZE decoded frames and detect on them in one call
+        batch = []
+        while len(batch) < YOLO_BATCH_SIZE:
+            item = frames.get()
+            if item is None:
+                reader_done = True
+                break
+            batch.append(item)
+
+        if not batch:
             break
-        frame_idx += 1
-        if frame_idx % FRAME_SKIP != 0:
-            continue
-
-        t0 = time.time()
-        h, w = frame.shape[:2]
-
-        results = yolo(frame, imgsz=640, conf=DETECT_CONF, iou=IOU)[0]
-        detections = []
-        if hasattr(results, 'boxes') and len(results.boxes) > 0:
-            for box in results.boxes:
-                cls = int(box.cls[0].numpy())
-                if cls != 0:
-                    continue
-                conf = float(box.conf[0].numpy())
-                x1, y1, x2, y2 = map(int, box.xyxy[0].numpy())
-                x1 = max(0, x1); y1 = max(0, y1)
-                x2 = min(w-1, x2); y2 = min(h-1, y2)
-                detections.append(([x1, y1, x2, y2], conf, None))
 
-        tracks = tracker.update_tracks(detections, frame=frame)
+        # Only run YOLO where something moved inside a tracked box (or anywhere,
+        # when nothing is tracked), or when a full pass is due. Decided from the
+        # tracks as of the previous batch; skipped frames advance the tracker
+        # without detections.
+        run_detect = []
+        for _, f, diff in batch:
+            since_full += 1
+            full = (
+                diff is None
+                or since_full >= FORCE_FULL_EVERY
+                or _box_motion(diff, track_boxes, f.shape[1], f.shape[0]) >= MOTION_THRESHOLD
+            )
+            if full:
+                since_full = 0
+            run_detect.append(full)
+        detect_frames = [f for (_, f, _), full in zip(batch, run_detect) if full]
+        batch_results = iter(yolo(detect_frames, imgsz=640, conf=DETECT_CONF, iou=IOU, half=USE_CUDA) if detect_frames else [])
+
+        # Track frame by frame, in read order
+        for (frame_idx, frame, _), full in zip(batch, run_detect):
+            t0 = time.time()
+            h, w = frame.shape[:2]
+
+            if full:
+                results = next(batch_results)
+                detections = []
+                if hasattr(results, 'boxes') and len(results.boxes) > 0:
+                    # one device->host copy per field for all boxes, persons only
+                    boxes = results.boxes
+                    person = boxes.cls.cpu().numpy().astype(int) == 0
+                    confs = boxes.conf.cpu().numpy()[person]
+                    xyxy = boxes.xyxy.cpu().numpy()[person].astype(int)
+                    np.maximum(xyxy[:, :2], 0, out=xyxy[:, :2])
+                    np.minimum(xyxy[:, 2:], [w-1, h-1], out=xyxy[:, 2:])
+                    detections = [(box, conf, None) for box, conf in zip(xyxy.tolist(), confs.tolist())]
+            else:
+                detections = []
 
-        # process tracks
-        for tr in tracks:
-            if not tr.is_confirmed():
-                continue
-            track_id = tr.track_id
-            l, t, r, b = map(int, tr.to_ltrb())
-            if track_id not in tracks_data:
-                tracks_data[track_id] = {'faces': [], 'sils': [], 'last_seen': frame_idx}
-            tracks_data[track_id]['last_seen'] = frame_idx
-
-            crop = frame[t:b, l:r]
-            if crop.size == 0:
-                continue
+            tracks = tracker.update_tracks(detections, frame=frame)
 
-            # Save a detected crop for debugging
-            crop_fname = os.path.join(DETECTED_DIR, f"frame{frame_idx}_track{track_id}.jpg")
-            cv2.imwrite(crop_fname, crop)
-
-            # 1) Face attempt on crop
-            face_emb = get_face_embedding_from_image(crop, detector_backend='opencv', enforce=False)
-            if face_emb is not None:
-                tracks_data[track_id]['faces'].append((frame_idx, face_emb))
-                # keep at most last few
-                if len(tracks_data[track_id]['faces']) > 8:
-                    tracks_data[track_id]['faces'].pop(0)
-
-            # 2) Silhouette for gait
-            sil = silhouette_from_crop(crop)
-            tracks_data[track_id]['sils'].append(sil)
-            if len(tracks_data[track_id]['sils']) > TRACK_SIL_BUFFER:
-                tracks_data[track_id]['sils'].pop(0)
-
-            # Evaluate the track for matching
-            face_sim = None
-            gait_sim = None
-            fused_score = None
-            match_flag = False
-
-            # face-based decision (use most recent face)
-            if stored_face_emb is not None and len(tracks_data[track_id]['faces']) > 0:
-                # use last face
-                last_face_emb = tracks_data[track_id]['faces'][-1][1]
-                face_sim = float(np.dot(stored_face_emb / np.linalg.norm(stored_face_emb), last_face_emb / np.linalg.norm(last_face_emb)))
-                if face_sim >= FACE_SIM_THRESHOLD:
-                    fused_score = face_sim  # face dominates
-                    match_flag = True
-
-            # gait-based decision (if OpenGait available and enough silhouettes)
-            if not match_flag and USE_OPENGAIT and gait_model is not None and len(tracks_data[track_id]['sils']) >= SILHOUETTE_MIN_FRAMES:
-                # write temp sil frames
-                tmp_dir = os.path.join('tmp_tracks', f'track_{track_id}')
-                os.makedirs(tmp_dir, exist_ok=True)
-                # select last SILHOUETTE_MIN_FRAMES frames
-                sel = tracks_data[track_id]['sils'][-SILHOUETTE_MIN_FRAMES:]
-                for i, im in enumerate(sel):
-                    cv2.imwrite(os.path.join(tmp_dir, f"{i:04d}.png"), im)
-                try:
-                    emb = compute_gait_embedding_opengait(gait_model, gait_cfg, tmp_dir)
-                    if emb is not None and stored_gait_emb is not None:
-                        gait_sim = cosine_similarity(stored_gait_emb, emb)
-                        if gait_sim >= GAIT_SIM_THRESHOLD:
-                            fused_score = gait_sim
-                            match_flag = True
-                        else:
-                            # compute weighted fusion if face exists
-                            if face_sim is not None:
-                                fused_score = WEIGHT_FACE * face_sim + WEIGHT_GAIT * gait_sim
-                                if fused_score >= FACE_SIM_THRESHOLD:  # some fused threshold
-                                    match_flag = True
-                except Exception as e:
-                    print('[WARN] Gait embedding failed for track', track_id, e)
-
-            # Log + Save if match
-            saved_path = ''
-            if match_flag:
-                found_matches += 1
-                ts = time.strftime('%Y%m%d_%H%M%S')
-                match_fname = os.path.join(MATCHED_DIR, f"match_frame{frame_idx}_track{track_id}_{ts}.jpg")
-                # annotate
-                out_frame = frame.copy()
-                cv2.rectangle(out_frame, (l, t), (r, b), (0,255,0), 2)
-                label = f"MATCH id{track_id}"
-                if fused_score is not None:
-                    label += f" {fused_score:.2f}"
-                cv2.putText(out_frame, label, (l, max(0, t-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,0), 2)
-                cv2.imwrite(match_fname, out_frame)
-                saved_path = match_fname
-                print(f"[MATCH] Frame {frame_idx} track {track_id} saved to {match_fname} (face_sim={face_sim}, gait_sim={gait_sim}, fused={fused_score})")
-
-            # Write log entry
-            bbox = f"{l},{t},{r},{b}"
-            append_log([time.strftime('%Y-%m-%d %H:%M:%S'), frame_idx, track_id, bbox, face_sim, gait_sim, fused_score, match_flag, saved_path])
-
-        # Optional: cleanup old tracks_data entries not seen recently
-        to_delete = []
-        for tid, d in tracks_data.items():
-            if frame_idx - d['last_seen'] > 300:  # not seen for 300 frames
-                to_delete.append(tid)
-        for tid in to_delete:
-            del tracks_data[tid]
-
-        # display
-        disp = cv2.resize(frame, (min(1000, frame.shape[1]), int(frame.shape[0]*min(1000/frame.shape[1],1))))
-        cv2.imshow('Combined Surveillance', disp)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            print('[INFO] User exit')
-            break
+            # collect the confirmed track crops for this frame
+            track_crops = []
+            track_boxes = []
+            for tr in tracks:
+                if not tr.is_confirmed():
+                    continue
+                track_id = tr.track_id
+                l, t, r, b = map(int, tr.to_ltrb())
+                track_boxes.append((l, t, r, b))
+                if track_id not in tracks_data:
+                    tracks_data[track_id] = {
+                        'face_ema': None,
+                        'sil_buf': np.zeros((TRACK_SIL_BUFFER, GAIT_SIL_SIZE[1], GAIT_SIL_SIZE[0]), dtype=np.uint8),
+                        'sil_idx': 0,      # next write slot in sil_buf
+                        'sil_count': 0,    # silhouettes written so far
+                        'last_seen': frame_idx,
+                    }
+                tracks_data[track_id]['last_seen'] = frame_idx
+
+                # Without detections the box is only the tracker's prediction;
+                # faces, silhouettes and matches come from detected frames only
+                if not full:
+                    continue
 
-        t1 = time.time()
-        # print per-frame timing
-        print(f"[TIMING] Frame {frame_idx} processed in {(t1-t0):.2f}s | active tracks: {len(tracks_data)}")
+                crop = frame[t:b, l:r]
+                if crop.size == 0:
+                    continue
 
+                # Save a detected crop for debugging
+                if SAVE_DEBUG_CROPS:
+                    crop_fname = os.path.join(DETECTED_DIR, f"frame{frame_idx}_track{track_id}.jpg")
+                    cv2.imwrite(crop_fname, crop)
+                track_crops.append((track_id, (l, t, r, b), crop))
+
+            # 1) Face attempt on every crop in one DeepFace call
+            face_embs = get_face_embeddings_from_images(
+                [crop for _, _, crop in track_crops], detector_backend='opencv', enforce=False
+            )
+
+            # Fold each new face into the track's running (unit-length) face embedding
+            for (track_id, _, _), face_emb in zip(track_crops, face_embs):
+                if face_emb is not None:
+                    face_unit = normalize_embedding(face_emb)
+                    ema = tracks_data[track_id]['face_ema']
+                    if ema is not None:
+                        face_unit = normalize_embedding((1 - FACE_EMA_ALPHA) * ema + FACE_EMA_ALPHA * face_unit)
+                    tracks_data[track_id]['face_ema'] = face_unit
+
+            # Score every track's face embedding against the target at once
+            face_sims = {}
+            if stored_face_emb is not None:
+                scored_ids = [tid for tid, _, _ in track_crops if tracks_data[tid]['face_ema'] is not None]
+                if scored_ids:
+                    track_faces = np.stack([tracks_data[tid]['face_ema'] for tid in scored_ids])
+                    face_sims = dict(zip(scored_ids, (track_faces @ stored_face_emb).tolist()))
+
+            # process tracks
+            for track_id, (l, t, r, b), crop in track_crops:
+                # 2) Silhouette for gait (kept at the gait input size)
+                d = tracks_data[track_id]
+                d['sil_buf'][d['sil_idx']] = cv2.resize(silhouette_from_crop(crop), GAIT_SIL_SIZE)
+                d['sil_idx'] = (d['sil_idx'] + 1) % TRACK_SIL_BUFFER
+                d['sil_count'] += 1
+
+                # Evaluate the track for matching
+                gait_sim = None
+                fused_score = None
+                match_flag = False
+
+                # face-based decision (smoothed face embedding)
+                face_sim = face_sims.get(track_id)
+                if face_sim is not None:
+                    if face_sim >= FACE_SIM_THRESHOLD:
+                        fused_score = face_sim  # face dominates
+                        match_flag = True
+
+                # gait-based decision (if OpenGait available and enough silhouettes)
+                if not match_flag and USE_OPENGAIT and gait_model is not None and d['sil_count'] >= SILHOUETTE_MIN_FRAMES:
+                    # select last SILHOUETTE_MIN_FRAMES frames (oldest first)
+                    sel = d['sil_buf'][np.arange(d['sil_idx'] - SILHOUETTE_MIN_FRAMES, d['sil_idx']) % TRACK_SIL_BUFFER]
+                    try:
+                        emb = compute_gait_embedding_from_array(gait_model, sel)
+                        if emb is not None and stored_gait_emb is not None:
+                            gait_sim = float(np.dot(stored_gait_emb, normalize_embedding(emb)))
+                            if gait_sim >= GAIT_SIM_THRESHOLD:
+                                fused_score = gait_sim
+                                match_flag = True
+                            else:
+                                # compute weighted fusion if face exists
+                                if face_sim is not None:
+                                    fused_score = WEIGHT_FACE * face_sim + WEIGHT_GAIT * gait_sim
+                                    if fused_score >= FACE_SIM_THRESHOLD:  # some fused threshold
+                                        match_flag = True
+                    except Exception as e:
+                        print('[WARN] Gait embedding failed for track', track_id, e)
+
+                # Log + Save if match
+                saved_path = ''
+                if match_flag:
+                    found_matches += 1
+                    ts = time.strftime('%Y%m%d_%H%M%S')
+                    match_fname = os.path.join(MATCHED_DIR, f"match_frame{frame_idx}_track{track_id}_{ts}.jpg")
+                    # annotate
+                    out_frame = frame.copy()
+                    cv2.rectangle(out_frame, (l, t), (r, b), (0,255,0), 2)
+                    label = f"MATCH id{track_id}"
+                    if fused_score is not None:
+                        label += f" {fused_score:.2f}"
+                    cv2.putText(out_frame, label, (l, max(0, t-10)), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0,255,0), 2)
+                    match_writer.submit(write_match_frame, match_fname, out_frame)
+                    saved_path = match_fname
+                    print(f"[MATCH] Frame {frame_idx} track {track_id} saved to {match_fname} (face_sim={face_sim}, gait_sim={gait_sim}, fused={fused_score})")
+
+                # Write log entry (buffered; flushed on matches and every LOG_FLUSH_ROWS rows)
+                bbox = f"{l},{t},{r},{b}"
+                log_writer.writerow([time.strftime('%Y-%m-%d %H:%M:%S'), frame_idx, track_id, bbox, face_sim, gait_sim, fused_score, match_flag, saved_path])
+                log_rows += 1
+                if match_flag or log_rows % LOG_FLUSH_ROWS == 0:
+                    log_file.flush()
+
+            # Optional: cleanup old tracks_data entries not seen recently
+            to_delete = []
+            for tid, d in tracks_data.items():
+                if frame_idx - d['last_seen'] > 300:  # not seen for 300 frames
+                    to_delete.append(tid)
+            for tid in to_delete:
+                del tracks_data[tid]
+
+            # display (preview size worked out once; frames that already fit are shown as-is)
+            if disp_size is None:
+                disp_size = (w, h) if w <= DISPLAY_MAX_WIDTH else (DISPLAY_MAX_WIDTH, int(h * DISPLAY_MAX_WIDTH / w))
+            _offer_preview(previews, (frame, disp_size))
+            if user_quit.is_set():
+                print('[INFO] User exit')
+                stop = True
+                break
+
+            t1 = time.time()
+            # print per-frame timing
+            print(f"[TIMING] Frame {frame_idx} processed in {(t1-t0):.2f}s | active tracks: {len(tracks_data)}")
+
+    # Stop the reader (user exit) and wait for it before releasing the capture;
+    # draining the queue lets a blocked put() finish
+    stop_reader.set()
+    while reader.is_alive():
+        try:
+            frames.get(timeout=0.1)
+        except queue.Empty:
+            pass
     cap.release()
-    cv2.destroyAllWindows()
+    _offer_preview(previews, None)
+    display.join()
+    match_writer.shutdown(wait=True)
+    log_file.close()
     conn.close()
 
     print('[INFO] Processing complete. Matches found:', found_matches)
@@ -453,13 +745,21 @@ def compute_gait_embedding_opengait_inner(model, cfg, silhouette_dir):
     seq = load_silhouettes(silhouette_dir)
     if seq is None:
         return None
-    seq_t = torch.tensor(seq).unsqueeze(0).float()
+    seq_t = torch.tensor(seq).unsqueeze(0).float().to(GAIT_DEVICE)
     with torch.no_grad():
         features = model(seq_t)
         emb = features['embeddings'].cpu().numpy()[0]
     return emb
 
 
+def normalize_embedding(emb):
+    """Return emb scaled to unit length (None and all-zero vectors unchanged)."""
+    if emb is None:
+        return None
+    norm = np.linalg.norm(emb)
+    return emb / norm if norm > 0 else emb
+
+
 def cosine_similarity(a, b):
     a = a / np.linalg.norm(a)
     b = b / np.linalg.norm(b)
@@ -73,6 +73,7 @@ EXPECTED_SCHEMA = {
         ("started_at", "TIMESTAMP"),
         ("completed_at", "TIMESTAMP"),
         ("pdf_report_path", "TEXT"),
+        ("total_detections", "INTEGER"),
     ],
     "cctv_scan_results": [
         ("scan_task_id", "INTEGER"),
@@ -87,6 +88,10 @@ EXPECTED_SCHEMA = {
 
 conn = sqlite3.connect(DB_PATH)
 c = conn.cursor()
+c.execute("PRAGMA journal_mode=WAL")  # same mode the app runs with
+
+# All ALTERs go in one transaction: one commit/fsync instead of one per column
+c.execute("BEGIN IMMEDIATE")
 
 print("\n🔄 Starting migration...\n")
 total_added = 0
@@ -94,7 +99,7 @@ total_added = 0
 for table_name, expected_columns in EXPECTED_SCHEMA.items():
     # Check if table exists
     c.execute(
-        f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'"
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
     )
     if not c.fetchone():
         print(
@@ -1,13 +1,12 @@
 import streamlit as st
-import cv2
-import numpy as np
-from database import get_db_connection
+from database import db_connection
 import os
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config.bhopal_sehore_locations import CCTV_LOCATIONS, get_location_by_name
+from config.bhopal_sehore_locations import CCTV_LOCATION_NAMES, get_location_by_name
+from utils.dashboard_utils import clear_case_caches
 
 st.set_page_config(page_title="File Complaint", page_icon="📝")
 
@@ -42,9 +41,8 @@ with st.form("complaint_form"):
         )
 
         if location_method == "Select from List":
-            location_names = [loc["name"] for loc in CCTV_LOCATIONS]
             selected_location = st.selectbox(
-                "Last Seen Location *", [""] + location_names
+                "Last Seen Location *", [""] + CCTV_LOCATION_NAMES
             )
             last_seen_location = selected_location
         else:
@@ -87,7 +85,7 @@ with st.form("complaint_form"):
             if location_method == "Select from List" and selected_location:
                 coords = get_location_by_name(selected_location)
                 if coords:
-                    lat, lon = coords["lat"], coords["lon"]
+                    lat, lon = coords.lat, coords.lon
                     location_name = selected_location
             else:
                 try:
@@ -153,59 +151,60 @@ with st.form("complaint_form"):
                     st.error(f"Error: {result['error']}")
                     st.stop()
 
-                # Save to DB
-                conn = get_db_connection()
-                c = conn.cursor()
-
                 # Extract results
                 nlp = result.get("nlp_results", {})
                 geo = result.get("geo_results", {})
                 route = result.get("route_results", {})
 
-                # Insert into missing_cases
-                c.execute(
-                    """
-                    INSERT INTO missing_cases (name, age, description, last_seen_geohash, last_seen_location, 
-                                              time_lost, transcript, emotion, image_path, email)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        name,
-                        age,
-                        nlp.get("full_text", description),
-                        geo.get("geohash", ""),
-                        location_name,
-                        time_lost.strftime("%Y-%m-%d %H:%M:%S") if time_lost else None,
-                        nlp.get("transcription", ""),
-                        nlp.get("emotion", ""),
-                        photo_path,
-                        email,
-                    ),
-                )
-
-                case_id = c.lastrowid
-
-                # Save route prediction
                 import json
 
                 route_data = route.get("route", [])
                 cctv_videos = route.get("cctv_videos", [])
 
-                c.execute(
-                    """
-                    INSERT INTO geohash_predictions (case_id, start_geohash, predicted_path, cctv_videos)
-                    VALUES (?, ?, ?, ?)
-                """,
-                    (
-                        case_id,
-                        geo.get("geohash", ""),
-                        json.dumps(route_data),
-                        json.dumps(cctv_videos),
-                    ),
-                )
+                # Save to DB: case + route prediction in one transaction on a
+                # pooled connection (rolled back and returned to the pool on error)
+                with db_connection() as conn, conn:
+                    c = conn.cursor()
+
+                    # Insert into missing_cases
+                    c.execute(
+                        """
+                        INSERT INTO missing_cases (name, age, description, last_seen_geohash, last_seen_location, 
+                                                  time_lost, transcript, emotion, image_path, email)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        RETURNING id
+                    """,
+                        (
+                            name,
+                            age,
+                            nlp.get("full_text", description),
+                            geo.get("geohash", ""),
+                            location_name,
+                            time_lost.strftime("%Y-%m-%d %H:%M:%S") if time_lost else None,
+                            nlp.get("transcription", ""),
+                            nlp.get("emotion", ""),
+                            photo_path,
+                            email,
+                        ),
+                    )
+                    case_id = c.fetchone()[0]
+
+                    # Save route prediction
+                    c.execute(
+                        """
+                        INSERT INTO geohash_predictions (case_id, start_geohash, predicted_path, cctv_videos)
+                        VALUES (?, ?, ?, ?)
+                    """,
+                        (
+                            case_id,
+                            geo.get("geohash", ""),
+                            json.dumps(route_data),
+                            json.dumps(cctv_videos),
+                        ),
+                    )
 
-                conn.commit()
-                conn.close()
+                # Show the new case on the Dashboard / Video Scan pages right away
+                clear_case_caches()
 
             st.success(f"✅ Complaint filed successfully! Case ID: {case_id}")
 
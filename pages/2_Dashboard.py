@@ -1,5 +1,4 @@
 import streamlit as st
-from database import get_db_connection
 import pandas as pd
 import json
 import sys
@@ -7,6 +6,14 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.bhopal_sehore_locations import CCTV_LOCATIONS
+from utils.dashboard_utils import (
+    get_all_cases,
+    get_route_predictions,
+    get_blockchain_reports,
+    get_scan_tasks,
+    get_scan_results,
+    get_cctv_map_df,
+)
 
 st.set_page_config(page_title="Investigation Dashboard", page_icon="🚔", layout="wide")
 
@@ -14,14 +21,13 @@ st.title("🚔 AI Investigation Dashboard")
 st.markdown("### Bhopal/Sehore District - Missing Persons")
 
 # Fetch data
-conn = get_db_connection()
-df = pd.read_sql("SELECT * FROM missing_cases ORDER BY date_reported DESC", conn)
+df = get_all_cases()
 
 if not df.empty:
     st.markdown(f"### Active Cases ({len(df)})")
     
     # Display cases in a nice format
-    for idx, row in df.iterrows():
+    for row in df.to_dict('records'):
         with st.expander(f"Case #{row['id']} - {row['name']} (Age: {row['age']})"):
             col1, col2, col3 = st.columns(3)
             
@@ -48,8 +54,7 @@ if not df.empty:
     
     if selected_case_id:
         # Get predictions
-        preds = pd.read_sql("SELECT * FROM geohash_predictions WHERE case_id = ? ORDER BY timestamp DESC", 
-                           conn, params=(selected_case_id,))
+        preds = get_route_predictions(selected_case_id)
         
         if not preds.empty:
             pred_data = preds.iloc[0]
@@ -61,13 +66,9 @@ if not df.empty:
             with col1:
                 st.markdown("#### Predicted Movement Path")
                 
-                # Prepare data for map
-                map_data = []
-                for p in path_data:
-                    map_data.append({"lat": p['lat'], "lon": p['lon']})
-                
-                if map_data:
-                    st.map(pd.DataFrame(map_data))
+                # Map straight from the path points (pandas picks out lat/lon)
+                if path_data:
+                    st.map(pd.DataFrame(path_data, columns=["lat", "lon"]))
                 
                 st.markdown("**Path Details:**")
                 for i, p in enumerate(path_data[:5]):
@@ -81,25 +82,26 @@ if not df.empty:
                     st.info(f"📹 **{cctv['name']}**\n\nVideo: `{cctv['video_path']}`")
         
         # Show blockchain reports if any
-        reports = pd.read_sql("SELECT * FROM blockchain_reports WHERE case_id = ? ORDER BY timestamp DESC", 
-                             conn, params=(selected_case_id,))
+        reports = get_blockchain_reports(selected_case_id)
         
         if not reports.empty:
             st.markdown("---")
             st.markdown("#### Blockchain Reports")
-            for idx, report in reports.iterrows():
+            for report in reports.to_dict('records'):
                 st.success(f"🔗 Report #{report['id']}\n\n**Hash:** `{report['blockchain_hash']}`\n\n**Time:** {report['timestamp']}")
         
         # Show scan tasks and progress
         st.markdown("---")
         st.markdown("#### CCTV Scan Tasks")
         
-        scan_tasks = pd.read_sql("""
-            SELECT * FROM scan_tasks WHERE case_id = ? ORDER BY started_at DESC
-        """, conn, params=(selected_case_id,))
+        scan_tasks = get_scan_tasks(selected_case_id)
         
         if not scan_tasks.empty:
-            for idx, task in scan_tasks.iterrows():
+            # Scan results for every task of this case in one query, split per task
+            all_results = get_scan_results(selected_case_id)
+            results_by_task = dict(tuple(all_results.groupby('scan_task_id')))
+
+            for task in scan_tasks.to_dict('records'):
                 status_emoji = {
                     'pending': '⏳',
                     'in_progress': '🔄',
@@ -126,15 +128,10 @@ if not df.empty:
                         st.progress(progress)
                         st.write(f"Progress: {progress * 100:.1f}%")
                     
-                    # Get scan results
-                    scan_results = pd.read_sql("""
-                        SELECT csr.*, cl.name as cctv_name
-                        FROM cctv_scan_results csr
-                        JOIN cctv_locations cl ON csr.cctv_id = cl.id
-                        WHERE csr.scan_task_id = ?
-                    """, conn, params=(task['id'],))
+                    # Scan results for this task
+                    scan_results = results_by_task.get(task['id'])
                     
-                    if not scan_results.empty:
+                    if scan_results is not None:
                         total_detections = scan_results['detections_found'].sum()
                         st.write(f"**Total Detections:** {total_detections}")
                         
@@ -163,19 +160,10 @@ else:
 st.markdown("---")
 st.markdown("### CCTV Network - Bhopal/Sehore")
 
-cctv_df = pd.DataFrame([{
-    "lat": loc["lat"],
-    "lon": loc["lon"],
-    "name": loc["name"]
-} for loc in CCTV_LOCATIONS])
-
-st.map(cctv_df)
+st.map(get_cctv_map_df())
 
 st.markdown("**CCTV Locations:**")
 cols = st.columns(2)
 for i, loc in enumerate(CCTV_LOCATIONS):
     with cols[i % 2]:
         st.write(f"{i+1}. **{loc['name']}** ({loc['type']})")
-
-conn.close()
-
@@ -1,13 +1,12 @@
 import streamlit as st
 import os
-import tempfile
-import pandas as pd
 import json
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import get_db_connection
 from config.bhopal_sehore_locations import CCTV_LOCATIONS
+from utils.dashboard_utils import get_active_cases, get_route_predictions, clear_report_caches
 
 st.set_page_config(page_title="CCTV Video Scan", page_icon="📹")
 
@@ -16,16 +15,17 @@ st.markdown("### Bhopal/Sehore District")
 
 # Get active cases
 conn = get_db_connection()
-cases = pd.read_sql("SELECT id, name, image_path, last_seen_location FROM missing_cases WHERE status='Active'", conn)
+cases = get_active_cases()
 
 if cases.empty:
     st.warning("No active cases to scan for. Please file a complaint first.")
 else:
     st.markdown(f"### Active Cases: {len(cases)}")
     
+    name_by_id = dict(zip(cases['id'].tolist(), cases['name'].tolist()))
     selected_case_id = st.selectbox("Select Case to Scan For", 
-                                    cases['id'].tolist(),
-                                    format_func=lambda x: f"Case #{x} - {cases[cases['id']==x]['name'].values[0]}")
+                                    list(name_by_id),
+                                    format_func=lambda x: f"Case #{x} - {name_by_id[x]}")
     
     if selected_case_id:
         case_data = cases[cases['id'] == selected_case_id].iloc[0]
@@ -42,8 +42,7 @@ else:
         st.markdown("---")
         
         # Get predicted CCTV locations for this case
-        preds = pd.read_sql("SELECT * FROM geohash_predictions WHERE case_id = ? ORDER BY timestamp DESC", 
-                           conn, params=(selected_case_id,))
+        preds = get_route_predictions(selected_case_id)
         
         if not preds.empty:
             cctv_videos = json.loads(preds.iloc[0]['cctv_videos']) if preds.iloc[0]['cctv_videos'] else []
@@ -73,10 +72,13 @@ else:
                     uploaded_video = st.file_uploader("Upload Video File", type=['mp4', 'avi', 'mov'])
                     
                     if uploaded_video is not None:
-                        tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') 
-                        tfile.write(uploaded_video.read())
-                        video_path = tfile.name
-                        tfile.close()
+                        import shutil
+                        import tempfile
+
+                        # copy in chunks rather than read() a second full copy of the clip
+                        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tfile:
+                            shutil.copyfileobj(uploaded_video, tfile, length=4 * 1024 * 1024)
+                            video_path = tfile.name
                         
                         st.video(video_path)
                         
@@ -127,6 +129,7 @@ else:
                                         VALUES (?, ?, ?)
                                     """, (selected_case_id, str(blockchain_report['report']), blockchain_report['blockchain_hash']))
                                     conn.commit()
+                                    clear_report_caches()
                                     
                                     # Send notification
                                     st.markdown("### Sending Email Notification...")
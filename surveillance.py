@@ -8,6 +8,7 @@ import os
 import cv2
 import time
 import sqlite3
+import threading
 import numpy as np
 from ultralytics import YOLO
 from deepface import DeepFace
@@ -22,6 +23,7 @@ DETECTED_DIR = os.path.join(OUTPUT_DIR, "detected_people")
 MATCHED_DIR = os.path.join(OUTPUT_DIR, "matches")
 FRAME_SAVE_EVERY = 30  # save a detected-person crop every N frames (for debugging)
 FRAME_SKIP = 5  # process every FRAME_SKIP-th frame (1 = all frames)
+YOLO_BATCH_SIZE = 16  # sampled frames sent to YOLO per forward pass
 SIMILARITY_THRESHOLD = 0.55  # cosine similarity threshold for Facenet512
 MAX_PERSON_BOX_AREA_RATIO = (
     0.95  # ignore boxes that are almost full frame (can be false person)
@@ -87,6 +89,33 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray):
     return float(np.dot(a, b))
 
 
+def normalize_embedding(emb: np.ndarray):
+    """Return emb as a float32 unit vector, or None if missing or all zeros."""
+    if emb is None:
+        return None
+    emb = np.asarray(emb, dtype=np.float32)
+    norm = np.linalg.norm(emb)
+    if norm == 0:
+        return None
+    return emb / norm
+
+
+def batch_cosine_similarity(target_unit: np.ndarray, embeddings):
+    """
+    Cosine similarity of one unit-norm target against a stack of embeddings,
+    computed as a single matrix-vector product.
+    Returns a float32 array; zero-norm rows (or a None target) score -1.0,
+    matching cosine_similarity.
+    """
+    embs = np.asarray(embeddings, dtype=np.float32)
+    if target_unit is None or embs.size == 0:
+        return np.full(len(embs), -1.0, dtype=np.float32)
+    norms = np.linalg.norm(embs, axis=1)
+    dots = embs @ target_unit
+    safe_norms = np.where(norms > 0, norms, 1.0)
+    return np.where(norms > 0, dots / safe_norms, -1.0).astype(np.float32)
+
+
 def get_face_embedding_from_image(img_bgr):
     """
     Input: BGR numpy image (cropped face or full image)
@@ -160,15 +189,51 @@ def get_face_embedding_from_image(img_bgr):
         return None
 
 
+# -------------
+# YOLO model reuse
+# -------------
+# Idle YOLO models by weights name. A model is only used by one scan at a
+# time (predictors are not thread-safe), but background scans reuse it
+# instead of loading the weights again. DeepFace caches its own models.
+_idle_yolo_models = {}
+_idle_yolo_lock = threading.Lock()
+
+
+def _borrow_yolo_model(name):
+    with _idle_yolo_lock:
+        idle = _idle_yolo_models.get(name)
+        if idle:
+            return idle.pop()
+    print("\n[INFO] Loading YOLOv8 model...")
+    return YOLO(name)  # will auto-download yolov8n weights if not present
+
+
+def _return_yolo_model(name, model):
+    with _idle_yolo_lock:
+        _idle_yolo_models.setdefault(name, []).append(model)
+
+
 # -------------
 # Main pipeline
 # -------------
-def surveillance_yolo_deepface(target_image_path, video_path):
+def surveillance_yolo_deepface(target_image_path, video_path, headless=False):
+    """
+    Scan video_path for the person in target_image_path.
+
+    headless=True is for background/worker-thread scans: no preview window
+    (OpenCV HighGUI is not thread-safe) and the target embedding is kept in
+    memory instead of being written to the shared face DB.
+    """
     ensure_dirs()
-    conn = init_database()
+    model_name = YOLO_MODEL
+    model = _borrow_yolo_model(model_name)
+    try:
+        return _run_surveillance(model, target_image_path, video_path, headless)
+    finally:
+        _return_yolo_model(model_name, model)
 
-    print("\n[INFO] Loading YOLOv8 model...")
-    model = YOLO(YOLO_MODEL)  # will auto-download yolov8n weights if not present
+
+def _run_surveillance(model, target_image_path, video_path, headless):
 
     print("[INFO] Encoding target person image (DeepFace Facenet512).")
     target_bgr = cv2.imread(target_image_path)
@@ -187,17 +252,27 @@ def surveillance_yolo_deepface(target_image_path, video_path):
             "matches": [],
         }
 
-    save_embedding(conn, "target_person", target_emb)
-    print("[OK] Target embedding saved to DB.")
-
-    stored_emb = load_embedding(conn, "target_person")
-    if stored_emb is None:
-        print("[ERROR] Failed to load stored embedding from DB.")
-        return {
-            "success": False,
-            "error": "Failed to load stored embedding from DB",
-            "matches": [],
-        }
+    if headless:
+        # Same float32 values the DB round trip would give back
+        stored_emb = target_emb.astype(np.float32)
+    else:
+        conn = init_database()
+        try:
+            save_embedding(conn, "target_person", target_emb)
+            print("[OK] Target embedding saved to DB.")
+            stored_emb = load_embedding(conn, "target_person")
+        finally:
+            conn.close()
+        if stored_emb is None:
+            print("[ERROR] Failed to load stored embedding from DB.")
+            return {
+                "success": False,
+                "error": "Failed to load stored embedding from DB",
+                "matches": [],
+            }
+
+    # Normalize the target once; per-frame similarities are then one matmul
+    target_unit = normalize_embedding(stored_emb)
 
     # open video
     cap = cv2.VideoCapture(video_path)
@@ -212,157 +287,182 @@ def surveillance_yolo_deepface(target_image_path, video_path):
     fps = cap.get(cv2.CAP_PROP_FPS) or 25
     print(f"[INFO] Video opened. FPS={fps:.2f}")
 
-    frame_idx = 0
+    frames_read = 0
     found_any = False
     last_save_idx = 0
     matches = []  # Store match information
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
+    stop = False
+
+    while not stop:
+        # Collect the next YOLO_BATCH_SIZE sampled frames
+        batch = []
+        while len(batch) < YOLO_BATCH_SIZE:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames_read += 1
+
+            # frame skipping for speed
+            if frames_read % FRAME_SKIP == 0:
+                batch.append((frames_read, frame))
+
+        if not batch:
             break
-        frame_idx += 1
-
-        # frame skipping for speed
-        if frame_idx % FRAME_SKIP != 0:
-            continue
 
-        t0 = time.time()
-        h, w = frame.shape[:2]
-        print(f"\n[LOG] Frame {frame_idx} - size: {w}x{h}")
-
-        # Run YOLO detection (person class id = 0)
-        # ultralytics returns results; use model.predict or model(frame)
-        results = model(
-            frame, imgsz=640, conf=0.25, iou=0.45
+        # Run YOLO detection on the whole batch in one forward pass
+        # ultralytics returns one result per input frame
+        t_batch = time.time()
+        batch_results = model(
+            [frame for _, frame in batch], imgsz=640, conf=0.25, iou=0.45
         )  # adjust conf threshold if needed
-        # results is list-like; take first
-        try:
-            dets = results[0].boxes.cpu().numpy()
-            # boxes: xyxy, confidence, cls
-        except Exception:
-            dets = []
-
-        persons = []
-        if hasattr(results[0], "boxes") and len(results[0].boxes) > 0:
-            for box in results[0].boxes:
-                cls = int(box.cls.cpu().numpy()[0])
-                conf = float(box.conf.cpu().numpy()[0])
-                x1, y1, x2, y2 = map(int, box.xyxy.cpu().numpy()[0])
-                # keep only person class (0)
-                if cls != 0:
-                    continue
-                # clamp
-                x1 = max(0, x1)
-                y1 = max(0, y1)
-                x2 = min(w - 1, x2)
-                y2 = min(h - 1, y2)
-                box_w = x2 - x1
-                box_h = y2 - y1
-                # filter suspiciously big boxes (full-frame false positives)
-                if (box_w * box_h) > (w * h * MAX_PERSON_BOX_AREA_RATIO):
-                    continue
-                persons.append((x1, y1, x2, y2, conf))
-
-        if len(persons) == 0:
-            print("[LOG] No person boxes detected by YOLO in this frame.")
-            # optionally, fallback to face detect on entire frame (skip for speed)
-            continue
+        print(
+            f"\n[TIMING] YOLO batch of {len(batch)} frame(s) in {(time.time() - t_batch):.2f}s"
+        )
 
-        print(f"[LOG] YOLO detected {len(persons)} person(s).")
+        for (frame_idx, frame), result in zip(batch, batch_results):
+            t0 = time.time()
+            h, w = frame.shape[:2]
+            print(f"\n[LOG] Frame {frame_idx} - size: {w}x{h}")
 
-        # Examine each person crop for face + embedding
-        for pid, (x1, y1, x2, y2, conf) in enumerate(persons):
-            crop = frame[y1:y2, x1:x2].copy()
-            if crop.size == 0:
+            # YOLO detections for this frame (person class id = 0)
+            try:
+                dets = result.boxes.cpu().numpy()
+                # boxes: xyxy, confidence, cls
+            except Exception:
+                dets = []
+
+            persons = []
+            if hasattr(result, "boxes") and len(result.boxes) > 0:
+                for box in result.boxes:
+                    cls = int(box.cls.cpu().numpy()[0])
+                    conf = float(box.conf.cpu().numpy()[0])
+                    x1, y1, x2, y2 = map(int, box.xyxy.cpu().numpy()[0])
+                    # keep only person class (0)
+                    if cls != 0:
+                        continue
+                    # clamp
+                    x1 = max(0, x1)
+                    y1 = max(0, y1)
+                    x2 = min(w - 1, x2)
+                    y2 = min(h - 1, y2)
+                    box_w = x2 - x1
+                    box_h = y2 - y1
+                    # filter suspiciously big boxes (full-frame false positives)
+                    if (box_w * box_h) > (w * h * MAX_PERSON_BOX_AREA_RATIO):
+                        continue
+                    persons.append((x1, y1, x2, y2, conf))
+
+            if len(persons) == 0:
+                print("[LOG] No person boxes detected by YOLO in this frame.")
+                # optionally, fallback to face detect on entire frame (skip for speed)
                 continue
 
-            # Save some detected crops for debugging
-            if (frame_idx - last_save_idx) >= FRAME_SAVE_EVERY:
-                fname = os.path.join(
-                    DETECTED_DIR, f"frame{frame_idx}_person{pid+1}.jpg"
-                )
-                cv2.imwrite(fname, crop)
-                last_save_idx = frame_idx
-                print(f"    [SAVE] Saved detected person crop: {fname}")
+            print(f"[LOG] YOLO detected {len(persons)} person(s).")
 
-            # Attempt face embedding on the person crop
-            emb = get_face_embedding_from_image(crop)
-            if emb is None:
-                print(
-                    f"    > Person #{pid+1}: No face found inside person box (or embedding failed)."
-                )
-                continue
+            # Examine each person crop for face + embedding
+            embedded = []  # (pid, box, conf, embedding) for crops with a face
+            for pid, (x1, y1, x2, y2, conf) in enumerate(persons):
+                crop = frame[y1:y2, x1:x2].copy()
+                if crop.size == 0:
+                    continue
 
-            similarity = cosine_similarity(stored_emb, emb)
-            print(
-                f"    > Person #{pid+1} embedding similarity = {similarity:.4f} (conf={conf:.2f})"
-            )
+                # Save some detected crops for debugging
+                if (frame_idx - last_save_idx) >= FRAME_SAVE_EVERY:
+                    fname = os.path.join(
+                        DETECTED_DIR, f"frame{frame_idx}_person{pid+1}.jpg"
+                    )
+                    cv2.imwrite(fname, crop)
+                    last_save_idx = frame_idx
+                    print(f"    [SAVE] Saved detected person crop: {fname}")
+
+                # Attempt face embedding on the person crop
+                emb = get_face_embedding_from_image(crop)
+                if emb is None:
+                    print(
+                        f"    > Person #{pid+1}: No face found inside person box (or embedding failed)."
+                    )
+                    continue
 
-            if similarity >= SIMILARITY_THRESHOLD:
-                found_any = True
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                match_fname = os.path.join(
-                    MATCHED_DIR, f"match_frame{frame_idx}_person{pid+1}_{timestamp}.jpg"
-                )
-                # draw bounding box + label on original frame
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                cv2.putText(
-                    frame,
-                    f"MATCH {similarity:.2f}",
-                    (x1, max(0, y1 - 10)),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.9,
-                    (0, 255, 0),
-                    2,
-                )
-                cv2.imwrite(match_fname, frame)
-
-                # Store match information
-                matches.append(
-                    {
-                        "frame": frame_idx,
-                        "person_id": pid + 1,
-                        "similarity": round(similarity, 4),
-                        "confidence": round(conf, 2),
-                        "image_path": match_fname,
-                        "timestamp": timestamp,
-                    }
-                )
+                embedded.append((pid, (x1, y1, x2, y2), conf, emb))
+
+            # Score every face in the frame against the target at once
+            similarities = batch_cosine_similarity(
+                target_unit, [emb for _, _, _, emb in embedded]
+            )
 
-                print("\n========== MATCH FOUND ==========")
+            for (pid, (x1, y1, x2, y2), conf, _), similarity in zip(embedded, similarities):
+                similarity = float(similarity)
                 print(
-                    f"  Frame: {frame_idx}, Person #{pid+1}, Similarity: {similarity:.4f}"
+                    f"    > Person #{pid+1} embedding similarity = {similarity:.4f} (conf={conf:.2f})"
                 )
-                print(f"  Saved matched frame to: {match_fname}")
-                print("=================================\n")
-                # optional: break if you want to stop at first match
-                # break
-
-        # show frame (optional)
-        # convert to smaller window for display performance
-        display_frame = frame.copy()
-        maxw = 1000
-        if display_frame.shape[1] > maxw:
-            scale = maxw / display_frame.shape[1]
-            display_frame = cv2.resize(
-                display_frame,
-                (
-                    int(display_frame.shape[1] * scale),
-                    int(display_frame.shape[0] * scale),
-                ),
-            )
-        cv2.imshow("Surveillance (press q to quit)", display_frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            print("[INFO] Exiting on user request.")
-            break
 
-        t1 = time.time()
-        print(f"[TIMING] Frame {frame_idx} processed in {(t1 - t0):.2f}s")
+                if similarity >= SIMILARITY_THRESHOLD:
+                    found_any = True
+                    timestamp = time.strftime("%Y%m%d_%H%M%S")
+                    match_fname = os.path.join(
+                        MATCHED_DIR, f"match_frame{frame_idx}_person{pid+1}_{timestamp}.jpg"
+                    )
+                    # draw bounding box + label on original frame
+                    cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                    cv2.putText(
+                        frame,
+                        f"MATCH {similarity:.2f}",
+                        (x1, max(0, y1 - 10)),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.9,
+                        (0, 255, 0),
+                        2,
+                    )
+                    cv2.imwrite(match_fname, frame)
+
+                    # Store match information
+                    matches.append(
+                        {
+                            "frame": frame_idx,
+                            "person_id": pid + 1,
+                            "similarity": round(similarity, 4),
+                            "confidence": round(conf, 2),
+                            "image_path": match_fname,
+                            "timestamp": timestamp,
+                        }
+                    )
+
+                    print("\n========== MATCH FOUND ==========")
+                    print(
+                        f"  Frame: {frame_idx}, Person #{pid+1}, Similarity: {similarity:.4f}"
+                    )
+                    print(f"  Saved matched frame to: {match_fname}")
+                    print("=================================\n")
+                    # optional: break if you want to stop at first match
+                    # break
+
+            if not headless:
+                # show frame (optional)
+                # convert to smaller window for display performance; frames that
+                # already fit are shown directly (no copy)
+                display_frame = frame
+                maxw = 1000
+                if display_frame.shape[1] > maxw:
+                    scale = maxw / display_frame.shape[1]
+                    display_frame = cv2.resize(
+                        display_frame,
+                        (
+                            int(display_frame.shape[1] * scale),
+                            int(display_frame.shape[0] * scale),
+                        ),
+                    )
+                cv2.imshow("Surveillance (press q to quit)", display_frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    print("[INFO] Exiting on user request.")
+                    stop = True
+                    break
+
+            t1 = time.time()
+            print(f"[TIMING] Frame {frame_idx} processed in {(t1 - t0):.2f}s")
 
     cap.release()
-    cv2.destroyAllWindows()
-    conn.close()
+    if not headless:
+        cv2.destroyAllWindows()
 
     if found_any:
         print(
@@ -379,7 +479,7 @@ def surveillance_yolo_deepface(target_image_path, video_path):
         "success": True,
         "matches_found": len(matches),
         "matches": matches,
-        "total_frames": frame_idx,
+        "total_frames": frames_read,
     }
 
 
@@ -0,0 +1,105 @@
+"""
+Cached read-only queries for the Streamlit pages.
+
+Streamlit reruns the whole page on every widget change; caching these
+DataFrames keeps a rerun from going back to SQLite each time. Kept out of
+database.py so the scan and report workers don't import Streamlit/pandas.
+"""
+import streamlit as st
+import pandas as pd
+
+from database import db_connection
+from config.bhopal_sehore_locations import CCTV_LOCATIONS
+
+# Seconds a cached query result is reused before SQLite is read again
+QUERY_CACHE_TTL = 30
+# Scan progress and match reports are written by background scans, so they go stale sooner
+SCAN_CACHE_TTL = 5
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def get_all_cases():
+    """All cases, newest first (Dashboard)."""
+    with db_connection() as conn:
+        return pd.read_sql("SELECT * FROM missing_cases ORDER BY date_reported DESC", conn)
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def get_active_cases():
+    """Active cases with the fields the Video Scan page needs."""
+    with db_connection() as conn:
+        return pd.read_sql(
+            "SELECT id, name, image_path, last_seen_location FROM missing_cases WHERE status='Active'",
+            conn,
+        )
+
+
+@st.cache_data(ttl=QUERY_CACHE_TTL, show_spinner=False)
+def get_route_predictions(case_id):
+    """Route predictions for a case, newest first."""
+    with db_connection() as conn:
+        return pd.read_sql(
+            "SELECT * FROM geohash_predictions WHERE case_id = ? ORDER BY timestamp DESC",
+            conn,
+            params=(case_id,),
+        )
+
+
+@st.cache_data(ttl=SCAN_CACHE_TTL, show_spinner=False)
+def get_blockchain_reports(case_id):
+    """Blockchain reports for a case, newest first."""
+    with db_connection() as conn:
+        return pd.read_sql(
+            "SELECT * FROM blockchain_reports WHERE case_id = ? ORDER BY timestamp DESC",
+            conn,
+            params=(case_id,),
+        )
+
+
+@st.cache_data(ttl=SCAN_CACHE_TTL, show_spinner=False)
+def get_scan_tasks(case_id):
+    """Scan tasks for a case, newest first."""
+    with db_connection() as conn:
+        return pd.read_sql(
+            "SELECT * FROM scan_tasks WHERE case_id = ? ORDER BY started_at DESC",
+            conn,
+            params=(case_id,),
+        )
+
+
+@st.cache_data(ttl=SCAN_CACHE_TTL, show_spinner=False)
+def get_scan_results(case_id):
+    """Per-CCTV scan results (with CCTV name) for every scan task of a case."""
+    with db_connection() as conn:
+        return pd.read_sql(
+            """
+            SELECT csr.*, cl.name as cctv_name
+            FROM cctv_scan_results csr
+            JOIN cctv_locations cl ON csr.cctv_id = cl.id
+            WHERE csr.scan_task_id IN (SELECT id FROM scan_tasks WHERE case_id = ?)
+            ORDER BY csr.scan_task_id, csr.id
+            """,
+            conn,
+            params=(case_id,),
+        )
+
+
+@st.cache_data(show_spinner=False)
+def get_cctv_map_df():
+    """CCTV lat/lon/name for st.map (static, built once per process)."""
+    return pd.DataFrame([{
+        "lat": loc["lat"],
+        "lon": loc["lon"],
+        "name": loc["name"]
+    } for loc in CCTV_LOCATIONS])
+
+
+def clear_case_caches():
+    """Drop cached case lists so a newly filed case shows up immediately."""
+    get_all_cases.clear()
+    get_active_cases.clear()
+
+
+def clear_report_caches():
+    """Drop cached blockchain reports after this process's page stores one."""
+    get_blockchain_reports.clear()
@@ -1,4 +1,24 @@
 import geohash2
+import numpy as np
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_BYTES = np.frombuffer(_BASE32.encode("ascii"), dtype=np.uint8)
+
+# ASCII code -> base32 value (-1 for invalid characters)
+_BASE32_LOOKUP = np.full(256, -1, dtype=np.int64)
+_BASE32_LOOKUP[_BASE32_BYTES] = np.arange(32)
+
+# Neighbor directions as (lat_step, lon_step) in cells
+_NEIGHBOR_OFFSETS = {
+    "n": (1, 0),
+    "ne": (1, 1),
+    "e": (0, 1),
+    "se": (-1, 1),
+    "s": (-1, 0),
+    "sw": (-1, -1),
+    "w": (0, -1),
+    "nw": (1, -1),
+}
 
 
 def encode_location(lat, lon, precision=8):
@@ -12,36 +32,111 @@ def decode_geohash(gh):
     return float(lat), float(lon)
 
 
+def _bit_counts(precision):
+    """Number of (lat, lon) bits in a geohash of given precision."""
+    total_bits = precision * 5
+    return total_bits // 2, (total_bits + 1) // 2
+
+
+def _interleave(lat_idx, lon_idx, precision):
+    """Interleave lat/lon cell indices into geohash integers (lon bit first)."""
+    lat_bits, lon_bits = _bit_counts(precision)
+    codes = np.zeros(lat_idx.shape, dtype=np.int64)
+    for i in range(precision * 5):
+        if i % 2 == 0:
+            bit = (lon_idx >> (lon_bits - 1 - i // 2)) & 1
+        else:
+            bit = (lat_idx >> (lat_bits - 1 - i // 2)) & 1
+        codes = (codes << 1) | bit
+    return codes
+
+
+def _deinterleave(codes, precision):
+    """Split geohash integers back into lat/lon cell indices."""
+    total_bits = precision * 5
+    lat_idx = np.zeros(codes.shape, dtype=np.int64)
+    lon_idx = np.zeros(codes.shape, dtype=np.int64)
+    for i in range(total_bits):
+        bit = (codes >> (total_bits - 1 - i)) & 1
+        if i % 2 == 0:
+            lon_idx = (lon_idx << 1) | bit
+        else:
+            lat_idx = (lat_idx << 1) | bit
+    return lat_idx, lon_idx
+
+
+def _codes_to_strings(codes, precision):
+    """Convert geohash integers to base32 strings."""
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.int64) * 5
+    digits = (codes[:, None] >> shifts) & 31
+    text = _BASE32_BYTES[digits].tobytes().decode("ascii")
+    return [text[i:i + precision] for i in range(0, len(text), precision)]
+
+
+def _strings_to_codes(geohashes, precision):
+    """Convert base32 geohash strings (all of one precision) to integers."""
+    raw = np.frombuffer("".join(geohashes).encode("ascii"), dtype=np.uint8)
+    digits = _BASE32_LOOKUP[raw].reshape(len(geohashes), precision)
+    if (digits < 0).any():
+        raise ValueError("Invalid geohash character")
+    shifts = np.arange(precision - 1, -1, -1, dtype=np.int64) * 5
+    return np.bitwise_or.reduce(digits << shifts, axis=1)
+
+
+def encode_batch(lats, lons, precision=8):
+    """
+    Encode many latitude/longitude pairs into geohashes in one call.
+    Uses integer bit interleaving over NumPy arrays instead of per-point bisection.
+    """
+    lats = np.asarray(lats, dtype=np.float64).ravel()
+    lons = np.asarray(lons, dtype=np.float64).ravel()
+    if lats.size == 0:
+        return []
+
+    lat_bits, lon_bits = _bit_counts(precision)
+    lat_idx = np.clip(
+        np.floor((lats + 90.0) / 180.0 * (1 << lat_bits)), 0, (1 << lat_bits) - 1
+    ).astype(np.int64)
+    lon_idx = np.clip(
+        np.floor((lons + 180.0) / 360.0 * (1 << lon_bits)), 0, (1 << lon_bits) - 1
+    ).astype(np.int64)
+
+    return _codes_to_strings(_interleave(lat_idx, lon_idx, precision), precision)
+
+
+def neighbors_batch(geohashes):
+    """
+    Get the 8 adjacent cells for many geohashes of the same precision.
+    Returns a list of neighbor dicts (N, NE, E, SE, S, SW, W, NW).
+    """
+    if not geohashes:
+        return []
+
+    precision = len(geohashes[0])
+    if any(len(gh) != precision for gh in geohashes):
+        raise ValueError("All geohashes must have the same precision")
+
+    lat_bits, lon_bits = _bit_counts(precision)
+    lat_idx, lon_idx = _deinterleave(_strings_to_codes(geohashes, precision), precision)
+
+    neighbors = [{} for _ in geohashes]
+    for direction, (dlat, dlon) in _NEIGHBOR_OFFSETS.items():
+        # Latitude stops at the poles, longitude wraps around
+        n_lat = np.clip(lat_idx + dlat, 0, (1 << lat_bits) - 1)
+        n_lon = (lon_idx + dlon) % (1 << lon_bits)
+        for result, gh in zip(neighbors, _codes_to_strings(_interleave(n_lat, n_lon, precision), precision)):
+            result[direction] = gh
+
+    return neighbors
+
+
 def get_neighbors(gh):
     """
     Get neighboring geohashes.
-    geohash2 doesn't have a neighbors function, so we implement it manually.
+    geohash2 doesn't have a neighbors function, so we compute adjacent cells directly.
     """
     try:
-        # Decode the geohash to get lat/lon
-        lat, lon = geohash2.decode(gh)
-        # Ensure lat and lon are floats to avoid type errors
-        lat = float(lat)
-        lon = float(lon)
-        precision = len(gh)
-
-        # Calculate approximate degree offset based on precision
-        # At precision 8, each character is roughly 0.00001 degrees
-        offset = 0.0001 * (8 / precision)
-
-        # Generate 8 neighbors (N, NE, E, SE, S, SW, W, NW)
-        neighbors = {
-            "n": geohash2.encode(lat + offset, lon, precision=precision),
-            "ne": geohash2.encode(lat + offset, lon + offset, precision=precision),
-            "e": geohash2.encode(lat, lon + offset, precision=precision),
-            "se": geohash2.encode(lat - offset, lon + offset, precision=precision),
-            "s": geohash2.encode(lat - offset, lon, precision=precision),
-            "sw": geohash2.encode(lat - offset, lon - offset, precision=precision),
-            "w": geohash2.encode(lat, lon - offset, precision=precision),
-            "nw": geohash2.encode(lat + offset, lon - offset, precision=precision),
-        }
-
-        return neighbors
+        return neighbors_batch([gh])[0]
     except Exception as e:
         print(f"[ERROR] Failed to get neighbors for geohash {gh}: {e}")
         return {}
@@ -7,19 +7,98 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from datetime import datetime
-import sys
 import os
-
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import queue
+import atexit
+import threading
 
 from config.email_config import (
     get_email_config,
     MATCH_FOUND_SUBJECT,
-    MATCH_FOUND_BODY,
+    render_match_body,
     CASE_FILED_SUBJECT,
-    CASE_FILED_BODY,
+    render_case_filed_body,
+    MAX_SMTP_SESSIONS,
 )
 
+# Bound concurrent SMTP sessions (notifications may be sent from worker threads)
+_smtp_semaphore = threading.BoundedSemaphore(MAX_SMTP_SESSIONS)
+
+# Idle logged-in SMTP sessions, reused so a burst of alerts pays for one
+# connect + STARTTLS + login instead of one per email
+_smtp_sessions = queue.LifoQueue(maxsize=MAX_SMTP_SESSIONS)
+
+
+def _open_smtp_session(config):
+    """Connect to the SMTP server, upgrade to TLS and log in."""
+    server = smtplib.SMTP(config["smtp_server"], config["smtp_port"])
+    try:
+        server.starttls()
+        server.login(config["sender_email"], config["sender_password"])
+    except Exception:
+        _close_smtp_session(server)
+        raise
+    return server
+
+
+def _close_smtp_session(server):
+    """Quit an SMTP session, ignoring errors from an already-dead connection."""
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _checkout_smtp_session(config):
+    """Take an idle session that still answers NOOP, or open a new one."""
+    while True:
+        try:
+            server = _smtp_sessions.get_nowait()
+        except queue.Empty:
+            return _open_smtp_session(config)
+        try:
+            if server.noop()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        _close_smtp_session(server)
+
+
+def _release_smtp_session(server):
+    """Keep a session for reuse, or quit it if enough are already idle."""
+    try:
+        _smtp_sessions.put_nowait(server)
+    except queue.Full:
+        _close_smtp_session(server)
+
+
+@atexit.register
+def _close_smtp_sessions():
+    """Log out of idle SMTP sessions when the process exits."""
+    while True:
+        try:
+            server = _smtp_sessions.get_nowait()
+        except queue.Empty:
+            break
+        _close_smtp_session(server)
+
+
+def _deliver(config, recipient_email, text):
+    """Send a rendered message over a pooled SMTP session."""
+    with _smtp_semaphore:
+        server = _checkout_smtp_session(config)
+        try:
+            try:
+                server.sendmail(config["sender_email"], recipient_email, text)
+            except smtplib.SMTPServerDisconnected:
+                # Server dropped the session since the NOOP; retry once on a new one
+                server = _open_smtp_session(config)
+                server.sendmail(config["sender_email"], recipient_email, text)
+        except Exception:
+            _close_smtp_session(server)
+            raise
+        _release_smtp_session(server)
+
 
 def send_email(recipient_email, subject, body):
     """
@@ -45,19 +124,10 @@ def send_email(recipient_email, subject, body):
         # Add body
         msg.attach(MIMEText(body, "plain"))
 
-        # Connect to Gmail SMTP server
-        server = smtplib.SMTP(config["smtp_server"], config["smtp_port"])
-        server.starttls()
-
-        # Login
-        server.login(config["sender_email"], config["sender_password"])
-
-        # Send email
         text = msg.as_string()
-        server.sendmail(config["sender_email"], recipient_email, text)
 
-        # Disconnect
-        server.quit()
+        # Send email (reusing a logged-in Gmail SMTP session when one is idle)
+        _deliver(config, recipient_email, text)
 
         print(f"✅ Email sent successfully to {recipient_email}")
         return True
@@ -85,17 +155,19 @@ def send_match_notification(
     """
     subject = MATCH_FOUND_SUBJECT.format(case_id=case_data.get("id", "N/A"))
 
-    body = MATCH_FOUND_BODY.format(
-        recipient_name=case_data.get("name", "User"),
-        case_id=case_data.get("id", "N/A"),
-        person_name=case_data.get("name", "N/A"),
-        age=case_data.get("age", "N/A"),
-        location_name=location_data.get("name", "N/A"),
-        cctv_id=location_data.get("id", "N/A"),
-        confidence=round(match_data.get("score", 0) * 100, 2),
-        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        geohash=location_data.get("geohash", "N/A"),
-        blockchain_hash=blockchain_hash,
+    body = render_match_body(
+        {
+            "recipient_name": case_data.get("name", "User"),
+            "case_id": case_data.get("id", "N/A"),
+            "person_name": case_data.get("name", "N/A"),
+            "age": case_data.get("age", "N/A"),
+            "location_name": location_data.get("name", "N/A"),
+            "cctv_id": location_data.get("id", "N/A"),
+            "confidence": round(match_data.get("score", 0) * 100, 2),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "geohash": location_data.get("geohash", "N/A"),
+            "blockchain_hash": blockchain_hash,
+        }
     )
 
     return send_email(recipient_email, subject, body)
@@ -123,17 +195,19 @@ def send_case_filed_notification(recipient_email, case_data, route_prediction):
     else:
         route_text = "  No route prediction available"
 
-    body = CASE_FILED_BODY.format(
-        recipient_name=case_data.get("name", "User"),
-        case_id=case_data.get("id", "N/A"),
-        person_name=case_data.get("name", "N/A"),
-        age=case_data.get("age", "N/A"),
-        last_seen_location=case_data.get("last_seen_location", "N/A"),
-        date_reported=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        emotion=case_data.get("emotion", "N/A"),
-        geohash=case_data.get("geohash", "N/A"),
-        predicted_route=route_text,
-        num_cctv=len(route_prediction) if route_prediction else 0,
+    body = render_case_filed_body(
+        {
+            "recipient_name": case_data.get("name", "User"),
+            "case_id": case_data.get("id", "N/A"),
+            "person_name": case_data.get("name", "N/A"),
+            "age": case_data.get("age", "N/A"),
+            "last_seen_location": case_data.get("last_seen_location", "N/A"),
+            "date_reported": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "emotion": case_data.get("emotion", "N/A"),
+            "geohash": case_data.get("geohash", "N/A"),
+            "predicted_route": route_text,
+            "num_cctv": len(route_prediction) if route_prediction else 0,
+        }
     )
 
     return send_email(recipient_email, subject, body)
@@ -175,19 +249,10 @@ def send_email_with_attachment(recipient_email, subject, body, attachment_path):
                 )
                 msg.attach(pdf_attachment)
 
-        # Connect to Gmail SMTP server
-        server = smtplib.SMTP(config["smtp_server"], config["smtp_port"])
-        server.starttls()
-
-        # Login
-        server.login(config["sender_email"], config["sender_password"])
-
-        # Send email
         text = msg.as_string()
-        server.sendmail(config["sender_email"], recipient_email, text)
 
-        # Disconnect
-        server.quit()
+        # Send email (reusing a logged-in Gmail SMTP session when one is idle)
+        _deliver(config, recipient_email, text)
 
         print(f"✅ Email with attachment sent successfully to {recipient_email}")
         return True
@@ -230,16 +295,6 @@ def send_scan_complete_notification(case_id, scan_task_id, pdf_report_path):
             return False
         scan_task = dict(scan_task_row)
 
-        cursor.execute(
-            """
-            SELECT SUM(detections_found) as total_detections
-            FROM cctv_scan_results WHERE scan_task_id = ?
-        """,
-            (scan_task_id,),
-        )
-        stats_row = cursor.fetchone()
-        stats = dict(stats_row) if stats_row else {"total_detections": 0}
-
         conn.close()
 
         recipient_email = case.get("email")
@@ -247,7 +302,8 @@ def send_scan_complete_notification(case_id, scan_task_id, pdf_report_path):
             print("[WARNING] No email address for case, skipping notification")
             return False
 
-        total_detections = stats.get("total_detections", 0) or 0
+        # Stored on the task when the scan completes
+        total_detections = scan_task.get("total_detections") or 0
 
         subject = f"🔍 CCTV Scan Complete - Case #{case_id}"
 
@@ -1,11 +1,9 @@
 import random
 import math
-import sys
-import os
 from datetime import datetime, timedelta
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.geohash_utils import encode_location, decode_geohash
+from utils.geohash_utils import encode_location, decode_geohash, encode_batch
+from config.bhopal_sehore_locations import CCTV_LOCATIONS, get_nearest_cctv_location
 
 # Average human walking speed: 3.5 - 5 km/h
 # In m/s: ~1.0 - 1.4 m/s
@@ -36,8 +34,6 @@ def get_nearest_cctv_in_radius(lat, lon, radius_meters, max_count=3):
     Returns:
         List of CCTV locations sorted by distance (max max_count items)
     """
-    from config.bhopal_sehore_locations import CCTV_LOCATIONS
-    
     cctv_with_distance = []
     
     for cctv in CCTV_LOCATIONS:
@@ -80,7 +76,7 @@ def calculate_search_radius_from_time(hours_elapsed):
     else:
         return 20000  # 20 km
 
-def predict_route_with_time_analysis(start_lat, start_lon, time_lost, current_time=None):
+def predict_route_with_time_analysis(start_lat, start_lon, time_lost, current_time=None, start_geohash=None):
     """
     Predict route with time-based analysis.
     Selects nearest CCTVs based on elapsed time and walking distance.
@@ -90,6 +86,7 @@ def predict_route_with_time_analysis(start_lat, start_lon, time_lost, current_ti
         start_lon: Starting longitude
         time_lost: Datetime when person went missing
         current_time: Current datetime (defaults to now)
+        start_geohash: Precomputed geohash of the start point (optional)
         
     Returns:
         Dictionary with route prediction and CCTV locations (max 3)
@@ -118,7 +115,7 @@ def predict_route_with_time_analysis(start_lat, start_lon, time_lost, current_ti
     route.append({
         "lat": start_lat,
         "lon": start_lon,
-        "geohash": encode_location(start_lat, start_lon),
+        "geohash": start_geohash or encode_location(start_lat, start_lon),
         "step": 0,
         "time_elapsed_hours": 0,
         "search_radius_km": search_radius / 1000
@@ -129,7 +126,7 @@ def predict_route_with_time_analysis(start_lat, start_lon, time_lost, current_ti
         route.append({
             "lat": cctv["lat"],
             "lon": cctv["lon"],
-            "geohash": encode_location(cctv["lat"], cctv["lon"]),
+            "geohash": cctv["geohash"],  # Precomputed in CCTV_LOCATIONS
             "step": idx + 1,
             "nearest_cctv": cctv["name"],
             "cctv_id": cctv["id"],
@@ -185,7 +182,7 @@ def predict_next_location_random(lat, lon, time_delta_seconds=3600):
     
     return new_lat, new_lon
 
-def generate_route_prediction_with_cctv(start_lat, start_lon, steps=5):
+def generate_route_prediction_with_cctv(start_lat, start_lon, steps=5, start_cctv=None):
     """
     Generate route prediction biased toward CCTV locations in Bhopal/Sehore.
     Uses urban path model that favors movement toward known landmarks.
@@ -194,21 +191,22 @@ def generate_route_prediction_with_cctv(start_lat, start_lon, steps=5):
         start_lat: Starting latitude
         start_lon: Starting longitude
         steps: Number of prediction steps
+        start_cctv: Precomputed (nearest_cctv, distance) for the start point (optional)
         
     Returns:
         List of predicted locations with CCTV matches
     """
-    from config.bhopal_sehore_locations import CCTV_LOCATIONS, get_nearest_cctv_location
-    
     path = []
     current_lat, current_lon = start_lat, start_lon
     
     # Add start point with nearest CCTV
-    nearest_cctv, distance = get_nearest_cctv_location(current_lat, current_lon)
+    if start_cctv is not None:
+        nearest_cctv, distance = start_cctv
+    else:
+        nearest_cctv, distance = get_nearest_cctv_location(current_lat, current_lon)
     path.append({
         "lat": current_lat,
         "lon": current_lon,
-        "geohash": encode_location(current_lat, current_lon),
         "step": 0,
         "nearest_cctv": nearest_cctv["name"],
         "cctv_id": nearest_cctv["id"],
@@ -254,7 +252,6 @@ def generate_route_prediction_with_cctv(start_lat, start_lon, steps=5):
         path.append({
             "lat": next_lat,
             "lon": next_lon,
-            "geohash": encode_location(next_lat, next_lon),
             "step": i,
             "nearest_cctv": nearest_cctv["name"],
             "cctv_id": nearest_cctv["id"],
@@ -265,9 +262,15 @@ def generate_route_prediction_with_cctv(start_lat, start_lon, steps=5):
         visited_cctv_ids.add(nearest_cctv["id"])
         current_lat, current_lon = next_lat, next_lon
     
+    # Encode all predicted points in one batch
+    geohashes = encode_batch([p["lat"] for p in path], [p["lon"] for p in path])
+    for point, gh in zip(path, geohashes):
+        point["geohash"] = gh
+    
     return path
 
-def generate_route_prediction(start_lat, start_lon, steps=5, interval_minutes=30, time_lost=None):
+def generate_route_prediction(start_lat, start_lon, steps=5, interval_minutes=30, time_lost=None,
+                              start_geohash=None, start_cctv=None):
     """
     Generate a sequence of predicted locations.
     If time_lost is provided, uses time-based analysis.
@@ -279,16 +282,20 @@ def generate_route_prediction(start_lat, start_lon, steps=5, interval_minutes=30
         steps: Number of prediction steps (ignored if time_lost is provided)
         interval_minutes: Time interval (ignored if time_lost is provided)
         time_lost: Datetime when person went missing (optional)
+        start_geohash: Precomputed geohash of the start point (optional)
+        start_cctv: Precomputed (nearest_cctv, distance) for the start point (optional)
         
     Returns:
         Route prediction data
     """
     if time_lost:
         # Use time-based prediction
-        return predict_route_with_time_analysis(start_lat, start_lon, time_lost)
+        return predict_route_with_time_analysis(start_lat, start_lon, time_lost,
+                                                start_geohash=start_geohash)
     else:
         # Use CCTV-biased prediction (legacy)
-        path = generate_route_prediction_with_cctv(start_lat, start_lon, steps)
+        path = generate_route_prediction_with_cctv(start_lat, start_lon, steps,
+                                                   start_cctv=start_cctv)
         return {
             "route": path,
             "cctv_videos": get_cctv_videos_for_route(path),
@@ -5,12 +5,16 @@ import asyncio
 import json
 from datetime import datetime
 import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Simple in-memory storage for WebSocket connections
 # In production, use Redis or similar for multi-process support
 active_connections = []
 update_queue = asyncio.Queue() if hasattr(asyncio, 'Queue') else None
 
+# Single worker so queued dashboard messages go out in the order they were sent
+_BROADCAST_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broadcast")
+
 def send_scan_progress_update(case_id, progress_data):
     """
     Send scan progress update to dashboard via WebSocket.
@@ -115,6 +119,17 @@ def notify_match_found_realtime(case_id, cctv_id, match_data):
     })
 
 
+def notify_match_found_realtime_background(case_id, cctv_id, match_data):
+    """
+    Queue notify_match_found_realtime on the broadcast worker so the
+    caller (e.g. a CCTV scan) doesn't wait on the dashboard push.
+    
+    Returns:
+        Future that completes once the message has been broadcast
+    """
+    return _BROADCAST_POOL.submit(notify_match_found_realtime, case_id, cctv_id, match_data)
+
+
 # Note: This is a simplified WebSocket implementation
 # For production, implement a proper WebSocket server using the 'websockets' library
 # Example: